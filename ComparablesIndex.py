@@ -0,0 +1,327 @@
+"""
+Comparable listings – partitioned k-NN index
+============================================
+For a car (a scraped row or a user query) returns the k most similar listings
+with their prices, as an explanation next to the model estimate.
+
+• **Partitioned:** one KD-tree per normalised (make, model); a query only
+  ever touches its own partition.
+• **Feature space:** year, log-mileage, power, automatic gearbox and fuel,
+  each scaled by ``WEIGHTS`` so one unit ≈ one "meaningfully different" step.
+• **Flat, memory-mapped file layout** (same idea as CompiledModel.py):
+
+      index_dir/
+          CURRENT           name of the live version directory
+          v<ns>-<pid>/
+              partitions.json   (make, model) → point/node ranges, power fill
+              points.npy        N × D float32, reordered per KD-tree leaf
+              year.npy, mileage.npy, power.npy, price.npy, fuel.npy, gearbox.npy
+              url_offsets.npy + urls.bin   listing URLs as one UTF-8 blob
+              split_dim.npy, split_val.npy, left.npy, right.npy, lo.npy, hi.npy
+
+• **Incremental:** ``insert`` puts new listings in a small in-memory delta
+  per partition that queries scan brute-force; ``save`` folds it in.
+
+``build`` writes a new version directory and then switches ``CURRENT`` with
+a single ``os.replace``, so a reader sees either the old or the new version,
+never a gap.  Readers resolve ``CURRENT`` once and open every file from that
+version; the previous version is kept until the next build, and processes
+that still map older files keep reading them (unlinked, never truncated).
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+import shutil
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from Normalize import COLLECTOR_CSVS, iter_normalized
+
+# ───────────────────── CONFIG ─────────────────────
+INDEX_DIR  = Path("comparables_index")
+LEAF_SIZE  = 32
+K_DEFAULT  = 10
+FUELS      = ["petrol", "diesel", "hybrid", "electric", "lpg", "cng", "other"]
+WEIGHTS    = {"year": 1 / 2.0,          # 2 years      → 1 unit
+              "log_km": 1 / 0.25,       # ±25 % km     → 1 unit
+              "power_kw": 1 / 20.0,     # 20 kW        → 1 unit
+              "automatic": 1.5,
+              "fuel": 2.0}
+NODE_ARRAYS = ("split_dim", "split_val", "left", "right", "lo", "hi")
+DATA_ARRAYS = ("points", "year", "mileage", "power", "price", "fuel", "gearbox", "url_offsets")
+GEARBOXES   = ["manual", "automatic"]
+# ─────────────────────────────────────────────────
+
+DIM = 4 + len(FUELS)
+
+
+def partition_key(rec: dict) -> Optional[str]:
+    if not rec.get("make") or not rec.get("model"):
+        return None
+    return f"{rec['make']}|{rec['model']}"
+
+
+def vectorize(rec: dict, power_fill: float) -> np.ndarray:
+    v = np.zeros(DIM, dtype=np.float32)
+    v[0] = (rec.get("year") or 0) * WEIGHTS["year"]
+    v[1] = math.log1p(rec.get("mileage_km") or 0) * WEIGHTS["log_km"]
+    power = rec.get("power_kw")
+    v[2] = (power if power is not None else power_fill) * WEIGHTS["power_kw"]
+    v[3] = WEIGHTS["automatic"] if rec.get("transmission") == "automatic" else 0.0
+    if rec.get("fuel") in FUELS:
+        v[4 + FUELS.index(rec["fuel"])] = WEIGHTS["fuel"]
+    return v
+
+# ────────── BUILD ──────────
+
+def _build_tree(points: np.ndarray, order: np.ndarray, nodes: dict) -> int:
+    """Build a KD-tree over ``points[order]`` in place; return the root node id.
+
+    Node ids are global across partitions; leaf ranges ``lo:hi`` index the
+    partition-local point order.
+    """
+    def make(lo: int, hi: int) -> int:
+        node = len(nodes["split_dim"])
+        for name in NODE_ARRAYS:
+            nodes[name].append(-1)
+        nodes["lo"][-1], nodes["hi"][-1] = lo, hi
+        if hi - lo <= LEAF_SIZE:
+            return node
+        pts = points[order[lo:hi]]
+        spread = pts.max(axis=0) - pts.min(axis=0)
+        dim = int(np.argmax(spread))
+        if spread[dim] == 0:
+            return node
+        mid = (hi - lo) // 2
+        part = np.argpartition(pts[:, dim], mid)
+        order[lo:hi] = order[lo:hi][part]
+        nodes["split_dim"][node] = dim
+        nodes["split_val"][node] = float(points[order[lo + mid], dim])
+        nodes["left"][node] = make(lo, lo + mid)
+        nodes["right"][node] = make(lo + mid, hi)
+        return node
+
+    return make(0, len(order))
+
+
+def current_version(index_dir: Path = INDEX_DIR) -> Path:
+    """Directory of the live index version named by ``index_dir/CURRENT``."""
+    index_dir = Path(index_dir)
+    return index_dir / (index_dir / "CURRENT").read_text(encoding="utf-8").strip()
+
+
+def build(records: Iterable[dict], index_dir: Path = INDEX_DIR) -> Path:
+    """Build and save an index over normalised records that carry a price."""
+    groups: Dict[str, List[dict]] = defaultdict(list)
+    seen_urls = set()
+    for rec in records:
+        key = partition_key(rec)
+        url = rec.get("url")
+        if not key or not rec.get("price") or (url and url in seen_urls):
+            continue
+        if url:
+            seen_urls.add(url)
+        groups[key].append(rec)
+
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    tmp_dir = index_dir / f".building-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+    data = {name: [] for name in ("points", "year", "mileage", "power", "price", "fuel", "gearbox")}
+    urls: List[bytes] = []
+    nodes = {name: [] for name in NODE_ARRAYS}
+    partitions = {}
+    start = 0
+    for key in sorted(groups):
+        recs = groups[key]
+        powers = [r["power_kw"] for r in recs if r.get("power_kw") is not None]
+        power_fill = float(np.median(powers)) if powers else 0.0
+        pts = np.vstack([vectorize(r, power_fill) for r in recs])
+        order = np.arange(len(recs))
+        root = _build_tree(pts, order, nodes)
+        for i in order:
+            r = recs[i]
+            data["year"].append(r.get("year") or 0)
+            data["mileage"].append(r.get("mileage_km") or np.nan)
+            data["power"].append(np.nan if r.get("power_kw") is None else r["power_kw"])
+            data["price"].append(r["price"])
+            data["fuel"].append(FUELS.index(r["fuel"]) if r.get("fuel") in FUELS else -1)
+            data["gearbox"].append(GEARBOXES.index(r["transmission"])
+                                   if r.get("transmission") in GEARBOXES else -1)
+            urls.append((r.get("url") or "").encode("utf-8"))
+        data["points"].append(pts[order])
+        partitions[key] = {"start": start, "end": start + len(recs),
+                           "root": root, "power_fill": power_fill}
+        start += len(recs)
+
+    arrays = {
+        "points": np.vstack(data["points"]) if data["points"] else np.zeros((0, DIM), np.float32),
+        "year": np.asarray(data["year"], dtype=np.int16),
+        "mileage": np.asarray(data["mileage"], dtype=np.float32),
+        "power": np.asarray(data["power"], dtype=np.float32),
+        "price": np.asarray(data["price"], dtype=np.float32),
+        "fuel": np.asarray(data["fuel"], dtype=np.int8),
+        "gearbox": np.asarray(data["gearbox"], dtype=np.int8),
+        "url_offsets": np.cumsum([0] + [len(u) for u in urls]).astype(np.int64),
+        "split_dim": np.asarray(nodes["split_dim"], dtype=np.int16),
+        "split_val": np.asarray(nodes["split_val"], dtype=np.float32),
+        "left": np.asarray(nodes["left"], dtype=np.int32),
+        "right": np.asarray(nodes["right"], dtype=np.int32),
+        "lo": np.asarray(nodes["lo"], dtype=np.int32),
+        "hi": np.asarray(nodes["hi"], dtype=np.int32),
+    }
+    for name, arr in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", arr)
+    (tmp_dir / "urls.bin").write_bytes(b"".join(urls))
+    (tmp_dir / "partitions.json").write_text(
+        json.dumps({"weights": WEIGHTS, "fuels": FUELS, "partitions": partitions}),
+        encoding="utf-8")
+
+    # Publish: name the finished version, then switch CURRENT in one rename
+    version = f"v{time.time_ns()}-{os.getpid()}"
+    os.rename(tmp_dir, index_dir / version)
+    previous = (index_dir / "CURRENT").read_text(encoding="utf-8").strip() \
+        if (index_dir / "CURRENT").is_file() else None
+    pointer = index_dir / f"CURRENT.tmp-{os.getpid()}"
+    pointer.write_text(version, encoding="utf-8")
+    os.replace(pointer, index_dir / "CURRENT")
+    # Drop versions older than the previous one (its readers may still be opening it)
+    for old in index_dir.glob("v*"):
+        if old.name not in (version, previous):
+            shutil.rmtree(old, ignore_errors=True)
+    return index_dir
+
+# ────────── QUERY ──────────
+
+class ComparablesIndex:
+    """Memory-mapped comparables index with an in-memory insert buffer."""
+
+    def __init__(self, index_dir: Path = INDEX_DIR):
+        self.index_dir = Path(index_dir)
+        self._open()
+        self.delta: Dict[str, List[dict]] = defaultdict(list)
+
+    def _open(self) -> None:
+        version_dir = current_version(self.index_dir)
+        meta = json.loads((version_dir / "partitions.json").read_text(encoding="utf-8"))
+        self.partitions: Dict[str, dict] = meta["partitions"]
+        self.a = {name: np.load(version_dir / f"{name}.npy", mmap_mode="r")
+                  for name in NODE_ARRAYS + DATA_ARRAYS}
+        self.urls = np.memmap(version_dir / "urls.bin", dtype=np.uint8, mode="r") \
+            if (version_dir / "urls.bin").stat().st_size else np.zeros(0, np.uint8)
+
+    @classmethod
+    def load(cls, index_dir: Path = INDEX_DIR) -> "ComparablesIndex":
+        return cls(index_dir)
+
+    def _url(self, i: int) -> str:
+        off = self.a["url_offsets"]
+        return bytes(self.urls[off[i]:off[i + 1]]).decode("utf-8")
+
+    def insert(self, records: Iterable[dict]) -> int:
+        """Add freshly scraped listings; visible to queries immediately."""
+        n = 0
+        for rec in records:
+            key = partition_key(rec)
+            if key and rec.get("price"):
+                self.delta[key].append(rec)
+                n += 1
+        return n
+
+    def _search_tree(self, part: dict, q: np.ndarray, k: int) -> List[tuple]:
+        a = self.a
+        points, split_dim, split_val = a["points"], a["split_dim"], a["split_val"]
+        base = part["start"]
+        best: List[tuple] = []              # max-heap of (-dist², point index)
+        todo = [(0.0, part["root"])]        # min-heap of (lower bound, node)
+        while todo:
+            bound, node = heapq.heappop(todo)
+            if len(best) == k and bound >= -best[0][0]:
+                break
+            while split_dim[node] >= 0:
+                diff = float(q[split_dim[node]] - split_val[node])
+                near, far = (a["left"][node], a["right"][node]) if diff < 0 else \
+                            (a["right"][node], a["left"][node])
+                heapq.heappush(todo, (max(bound, diff * diff), int(far)))
+                node = near
+            lo, hi = base + int(a["lo"][node]), base + int(a["hi"][node])
+            d2 = ((points[lo:hi] - q) ** 2).sum(axis=1)
+            for j in np.argsort(d2)[:k]:
+                item = (-float(d2[j]), lo + int(j))
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+                else:
+                    break
+        return [(-nd, i) for nd, i in best]
+
+    def query(self, rec: dict, k: int = K_DEFAULT) -> List[dict]:
+        """k nearest listings to ``rec`` (a normalised record), closest first."""
+        key = partition_key(rec)
+        part = self.partitions.get(key)
+        power_fill = part["power_fill"] if part else 0.0
+        q = vectorize(rec, power_fill)
+        hits = []
+        if part:
+            for d2, i in self._search_tree(part, q, k):
+                hits.append({**self._row(i), "distance": math.sqrt(d2)})
+        for r in self.delta.get(key, ()):
+            d2 = float(((vectorize(r, power_fill) - q) ** 2).sum())
+            hits.append({"url": r.get("url"), "price": r["price"], "year": r.get("year"),
+                         "mileage_km": r.get("mileage_km"), "power_kw": r.get("power_kw"),
+                         "fuel": r.get("fuel"), "transmission": r.get("transmission"),
+                         "distance": math.sqrt(d2)})
+        hits.sort(key=lambda h: h["distance"])
+        return hits[:k]
+
+    def query_many(self, records: Sequence[dict], k: int = K_DEFAULT) -> List[List[dict]]:
+        """Batch query; records are grouped per partition to keep its pages hot."""
+        out: List[List[dict]] = [[] for _ in records]
+        for i in sorted(range(len(records)), key=lambda i: partition_key(records[i]) or ""):
+            out[i] = self.query(records[i], k)
+        return out
+
+    def _row(self, i: int) -> dict:
+        a = self.a
+        return {"url": self._url(i), "price": float(a["price"][i]),
+                "year": int(a["year"][i]) or None,
+                "mileage_km": None if np.isnan(a["mileage"][i]) else float(a["mileage"][i]),
+                "power_kw": None if np.isnan(a["power"][i]) else float(a["power"][i]),
+                "fuel": FUELS[a["fuel"][i]] if a["fuel"][i] >= 0 else None,
+                "transmission": GEARBOXES[a["gearbox"][i]] if a["gearbox"][i] >= 0 else None}
+
+    def _iter_records(self) -> Iterable[dict]:
+        for key, part in self.partitions.items():
+            make, model = key.split("|", 1)
+            for i in range(part["start"], part["end"]):
+                yield {"make": make, "model": model, **self._row(i)}
+        for recs in self.delta.values():
+            yield from recs
+
+    def save(self, index_dir: Optional[Path] = None) -> Path:
+        """Rebuild the on-disk index with the buffered inserts folded in and
+        re-open this object on the new files."""
+        records = list(self._iter_records())
+        self.index_dir = build(records, Path(index_dir or self.index_dir))
+        self.delta.clear()
+        self._open()
+        return self.index_dir
+
+# ────────── MAIN ──────────
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    build((r for f in COLLECTOR_CSVS if Path(f).is_file() for r in iter_normalized(f)), INDEX_DIR)
+    index = ComparablesIndex.load(INDEX_DIR)
+    print(f"🎉 {len(index.partitions):,} make/model partitions, "
+          f"{len(index.a['price']):,} listings indexed in {time.perf_counter() - t0:.1f}s → {INDEX_DIR}/")
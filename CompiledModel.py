@@ -0,0 +1,245 @@
+"""
+Compiled price model – flat, memory-mapped artifact
+===================================================
+Exports a trained scikit-learn regressor into a directory of plain NumPy
+arrays plus a small ``meta.json``, and scores it with a pure-NumPy evaluator.
+
+    model_dir/
+        meta.json          feature spec (numeric columns, vocabularies, fill
+                           values), model kind, target transform
+        coef.npy           linear models: one weight per encoded feature
+        feature.npy        tree models: split feature per node (-1 = leaf)
+        threshold.npy      tree models: split threshold per node
+        left.npy/right.npy tree models: child node indices (global)
+        value.npy          tree models: leaf value per node
+        roots.npy          tree models: root node index of every tree
+
+Arrays are opened with ``mmap_mode="r"``: loading costs a few milliseconds
+and every worker process scoring with the same file shares one copy of the
+model through the OS page cache.  Only NumPy is imported at load time;
+scikit-learn is needed for ``train_and_export`` / ``export`` alone.
+
+Supported estimators: LinearRegression / Ridge / Lasso (anything with
+``coef_``), DecisionTreeRegressor, RandomForestRegressor,
+ExtraTreesRegressor and GradientBoostingRegressor.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+# ───────────────────── CONFIG ─────────────────────
+NUMERIC_FEATURES = ["year", "mileage_km", "power_kw"]
+CATEGORICAL_FEATURES = ["make", "model", "fuel", "transmission", "body_type"]
+MAX_VOCAB = 2000           # most frequent values kept per categorical column
+MIN_COUNT = 3              # rarer values are encoded as "unknown"
+TREE_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+# ─────────────────────────────────────────────────
+
+# ────────── FEATURE SPEC & ENCODING ──────────
+
+def fit_spec(records: Sequence[dict], encoding: str = "ordinal") -> dict:
+    """Build the feature spec (vocabularies, numeric fill values) from normalised records."""
+    fill = {}
+    for col in NUMERIC_FEATURES:
+        values = [r[col] for r in records if r.get(col) is not None]
+        fill[col] = float(np.median(values)) if values else 0.0
+    vocab = {}
+    for col in CATEGORICAL_FEATURES:
+        counts = Counter(r[col] for r in records if r.get(col) is not None)
+        vocab[col] = sorted(v for v, n in counts.most_common(MAX_VOCAB) if n >= MIN_COUNT)
+    return {"numeric": list(NUMERIC_FEATURES), "fill": fill,
+            "categorical": vocab, "encoding": encoding}
+
+
+def n_encoded_features(spec: dict) -> int:
+    n = len(spec["numeric"])
+    if spec["encoding"] == "onehot":
+        return n + sum(len(v) for v in spec["categorical"].values())
+    return n + len(spec["categorical"])
+
+
+def encode(records: Iterable[dict], spec: dict) -> np.ndarray:
+    """Encode normalised records into the float matrix the model was trained on.
+
+    Ordinal encoding (tree models) maps each category to its vocabulary index
+    and unknown values to -1; one-hot encoding (linear models) leaves unknown
+    values as an all-zero block.
+    """
+    records = list(records)
+    X = np.zeros((len(records), n_encoded_features(spec)), dtype=np.float64)
+    numeric, fill = spec["numeric"], spec["fill"]
+    lookups = [(col, {v: i for i, v in enumerate(vocab)})
+               for col, vocab in spec["categorical"].items()]
+    onehot = spec["encoding"] == "onehot"
+    for i, rec in enumerate(records):
+        row = X[i]
+        for j, col in enumerate(numeric):
+            v = rec.get(col)
+            row[j] = fill[col] if v is None else v
+        j = len(numeric)
+        for col, index in lookups:
+            k = index.get(rec.get(col), -1)
+            if onehot:
+                if k >= 0:
+                    row[j + k] = 1.0
+                j += len(index)
+            else:
+                row[j] = k
+                j += 1
+    return X
+
+# ────────── EXPORT (needs scikit-learn) ──────────
+
+def _flatten_trees(trees: list) -> dict:
+    """Concatenate sklearn ``tree_`` structures into global node arrays."""
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in trees:
+        t = est.tree_
+        leaf = t.children_left < 0
+        roots.append(offset)
+        feature.append(np.where(leaf, -1, t.feature).astype(np.int32))
+        threshold.append(t.threshold.astype(np.float64))
+        left.append(np.where(leaf, -1, t.children_left + offset).astype(np.int32))
+        right.append(np.where(leaf, -1, t.children_right + offset).astype(np.int32))
+        value.append(t.value.reshape(t.node_count, -1)[:, 0].astype(np.float64))
+        offset += t.node_count
+        max_depth = max(max_depth, int(t.max_depth))
+    arrays = {
+        "feature": np.concatenate(feature), "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left), "right": np.concatenate(right),
+        "value": np.concatenate(value), "roots": np.asarray(roots, dtype=np.int32),
+    }
+    return {"arrays": arrays, "max_depth": max_depth}
+
+
+def export(estimator, spec: dict, path, target: str = "log") -> Path:
+    """Write a fitted estimator as a compiled model directory.
+
+    ``target`` is ``"log"`` when the estimator was fitted on ``log(price)``,
+    ``"identity"`` when it was fitted on the raw price.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    meta = {"spec": spec, "target": target}
+
+    if hasattr(estimator, "coef_"):
+        meta.update(kind="linear", intercept=float(np.ravel(estimator.intercept_)[0]))
+        arrays = {"coef": np.ravel(estimator.coef_).astype(np.float64)}
+    elif hasattr(estimator, "tree_"):
+        flat = _flatten_trees([estimator])
+        meta.update(kind="trees", base=0.0, scale=1.0, max_depth=flat["max_depth"])
+        arrays = flat["arrays"]
+    elif hasattr(estimator, "learning_rate"):          # GradientBoostingRegressor
+        flat = _flatten_trees([e for e in np.ravel(estimator.estimators_)])
+        init = getattr(estimator.init_, "constant_", 0.0)
+        meta.update(kind="trees", base=float(np.ravel(init)[0]),
+                    scale=float(estimator.learning_rate), max_depth=flat["max_depth"])
+        arrays = flat["arrays"]
+    elif hasattr(estimator, "estimators_"):            # RandomForest / ExtraTrees
+        flat = _flatten_trees(list(estimator.estimators_))
+        meta.update(kind="trees", base=0.0, scale=1.0 / len(estimator.estimators_),
+                    max_depth=flat["max_depth"])
+        arrays = flat["arrays"]
+    else:
+        raise TypeError(f"cannot compile estimator of type {type(estimator).__name__}")
+
+    for name, arr in arrays.items():
+        np.save(path / f"{name}.npy", np.ascontiguousarray(arr))
+    (path / "meta.json").write_text(json.dumps(meta, indent=1), encoding="utf-8")
+    return path
+
+
+def train_and_export(records: Sequence[dict], path, kind: str = "gbr") -> Path:
+    """Fit a price model on normalised records (with a price) and compile it.
+
+    kind: "gbr" (GradientBoostingRegressor), "rf" (RandomForestRegressor) or
+    "ridge" (Ridge on one-hot features).
+    """
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import Ridge
+
+    records = [r for r in records if r.get("price") and r["price"] > 0]
+    spec = fit_spec(records, encoding="onehot" if kind == "ridge" else "ordinal")
+    X = encode(records, spec)
+    y = np.log(np.array([r["price"] for r in records], dtype=np.float64))
+    if kind == "gbr":
+        est = GradientBoostingRegressor(n_estimators=300, max_depth=5, learning_rate=0.1)
+    elif kind == "rf":
+        est = RandomForestRegressor(n_estimators=100, min_samples_leaf=3, n_jobs=-1)
+    elif kind == "ridge":
+        est = Ridge(alpha=1.0)
+    else:
+        raise ValueError(f"unknown model kind {kind!r}")
+    est.fit(X, y)
+    return export(est, spec, path, target="log")
+
+# ────────── LOAD & SCORE (NumPy only) ──────────
+
+class CompiledModel:
+    """Memory-mapped compiled model; ``predict_records`` returns prices in €."""
+
+    def __init__(self, meta: dict, arrays: dict):
+        self.meta = meta
+        self.spec = meta["spec"]
+        self.kind = meta["kind"]
+        self.arrays = arrays
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "CompiledModel":
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        names = ("coef",) if meta["kind"] == "linear" else TREE_ARRAYS
+        mode = "r" if mmap else None
+        arrays = {n: np.load(path / f"{n}.npy", mmap_mode=mode) for n in names}
+        return cls(meta, arrays)
+
+    def _raw_predict(self, X: np.ndarray) -> np.ndarray:
+        if self.kind == "linear":
+            return X @ self.arrays["coef"] + self.meta["intercept"]
+
+        a = self.arrays
+        feature, threshold = a["feature"], a["threshold"]
+        left, right = a["left"], a["right"]
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.repeat(np.asarray(a["roots"])[None, :], X.shape[0], axis=0)
+        # Walk every (row, tree) pair one level per iteration
+        for _ in range(self.meta["max_depth"]):
+            f = feature[nodes]
+            internal = f >= 0
+            if not internal.any():
+                break
+            go_left = X[rows, np.where(internal, f, 0)] <= threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left[nodes], right[nodes]), nodes)
+        return self.meta["base"] + self.meta["scale"] * a["value"][nodes].sum(axis=1)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        raw = self._raw_predict(np.asarray(X, dtype=np.float64))
+        return np.exp(raw) if self.meta["target"] == "log" else raw
+
+    def predict_records(self, records: Iterable[dict]) -> np.ndarray:
+        return self.predict(encode(records, self.spec))
+
+
+def load(path, mmap: bool = True) -> CompiledModel:
+    return CompiledModel.load(path, mmap)
+
+
+def score_records(model: CompiledModel, records: List[dict]) -> List[dict]:
+    """Attach predicted_price and residual (scraped − predicted) to each record."""
+    preds = model.predict_records(records)
+    out = []
+    for rec, pred in zip(records, preds):
+        rec = dict(rec)
+        rec["predicted_price"] = round(float(pred), 2)
+        rec["residual"] = (round(rec["price"] - float(pred), 2)
+                           if rec.get("price") is not None else None)
+        out.append(rec)
+    return out
@@ -0,0 +1,505 @@
+"""
+Crawl engine – every marketplace in one process
+===============================================
+Shared fetching, scheduling, dedup and output for all collectors.  A site is a
+small adapter (see CrawlSites.py) that only knows its URLs and its pages:
+
+• **Fetchers** – one pooled ``requests.Session`` per plain-HTTP site and a
+  browser pool for sites that need Chrome (drivers created lazily, at most
+  ``BUDGET["browsers"]`` of them).  429 / 5xx answers and connection errors
+  are retried with exponential backoff; other 4xx pages (404 / 410) are skipped.
+• **Scheduler** – per-site queues of listing and detail tasks.  Workers take
+  detail pages before further listing pages (rows flow early, queues stay
+  short), rotate across sites for fairness and respect each site's
+  ``max_inflight`` and per-stage ``delay`` between requests.
+• **Dedup index** – ``site:ad_id`` keys seeded from the adapters' existing
+  output CSVs, so an ad already written (now or by an earlier run) is never
+  fetched twice.
+• **Sink** – appends rows to each adapter's CSV (header on creation, flush +
+  optional fsync), feeds the inline scorer and records "new" events in the
+  price history when those are configured.
+
+Everything runs under one global budget: ``BUDGET["workers"]`` threads,
+``BUDGET["browsers"]`` drivers and ``BUDGET["requests_per_s"]`` across all
+sites.
+
+Usage
+-----
+    python CrawlEngine.py [--site subito --site autoscout] [--workers 24]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import Metrics
+
+# ───────────────────── CONFIG ─────────────────────
+BUDGET = {"workers": 24, "browsers": 2, "requests_per_s": 20.0}
+RETRIES = 3                # extra attempts after a 429 / 5xx / incomplete page / connection error
+BACKOFF_S = 2.0            # first retry delay, doubled each attempt (capped at 60 s)
+JITTER = 0.3               # ± share of random jitter on every per-site delay
+TIMEOUT_S = 20
+FSYNC = True               # fsync every written row (GermanyDataCollector behaviour)
+SCORE_MODEL_DIR: Optional[str] = None   # compiled model → inline scoring per output file
+PRICE_HISTORY: Optional[str] = None     # PriceHistory log for "new" events (None = off)
+METRICS_PORT: Optional[int] = 9110
+# ─────────────────────────────────────────────────
+
+LIST, DETAIL = "listing", "detail"
+
+
+class Task:
+    """One page to fetch: a listing page (yields links + next page) or an ad."""
+    __slots__ = ("site", "kind", "url", "meta")
+
+    def __init__(self, site: str, kind: str, url: str, meta: Optional[dict] = None):
+        self.site, self.kind, self.url, self.meta = site, kind, url, meta or {}
+
+    def __repr__(self):
+        return f"Task({self.site}, {self.kind}, {self.url})"
+
+
+class SiteAdapter:
+    """What a marketplace has to provide; everything else is the engine's.
+
+    Subclasses set ``name`` / ``fieldnames`` and implement ``seeds``,
+    ``parse_listing`` and ``parse_detail``; the rest has sensible defaults.
+    """
+    name = "site"
+    fieldnames: Sequence[str] = ()
+    needs_browser = False                  # fetch through the browser pool
+    max_inflight = 8                       # concurrent requests to this site
+    delay = {LIST: 0.5, DETAIL: 0.0}       # minimum seconds between requests, per stage
+    headers: Dict[str, str] = {}
+
+    def seeds(self) -> Iterable[Task]:
+        """First listing pages (one per region / ZIP / search)."""
+        raise NotImplementedError
+
+    def parse_listing(self, html: str, task: Task) -> Tuple[Iterable[str], Optional[Task]]:
+        """Detail URLs on a listing page and the next listing page (None = stop)."""
+        raise NotImplementedError
+
+    def parse_detail(self, html: str, task: Task) -> Optional[dict]:
+        """Row for the output CSV (keys = fieldnames); None to skip the page."""
+        raise NotImplementedError
+
+    def key(self, url: str) -> str:
+        """Stable ad ID used for dedup and price history."""
+        return url
+
+    def output(self, task: Task) -> str:
+        """CSV the row of ``task`` goes to."""
+        return f"{self.name}.csv"
+
+    def outputs(self) -> Iterable[str]:
+        """Every CSV this adapter may write (read once to seed the dedup index)."""
+        return ()
+
+    def region(self, task: Task) -> Optional[str]:
+        return None
+
+    def complete(self, html: str, task: Task) -> bool:
+        """False for an error / bot-wall page served with 200 (browsers never see the
+        status code); such pages are retried like a 503."""
+        return True
+
+    def make_driver(self):
+        raise NotImplementedError(f"{self.name} needs a browser but has no make_driver()")
+
+    def prepare(self, driver, task: Task) -> None:
+        """Browser sites: interact with the loaded page (consent, scrolling) before reading it."""
+
+# ────────── BUDGET ──────────
+
+
+class RateLimiter:
+    """Global token bucket shared by every site."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)     # a bucket below one token would never pay out
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# ────────── FETCHERS ──────────
+
+
+class HttpFetcher:
+    """Pooled sessions (one per site) with retry + backoff."""
+
+    def __init__(self, pool_size: int):
+        self.pool_size = pool_size
+        self.sessions: Dict[str, object] = {}
+        self.lock = threading.Lock()
+
+    def _session(self, adapter: SiteAdapter):
+        with self.lock:
+            if adapter.name not in self.sessions:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                pool = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                session.mount("http://", pool)
+                session.mount("https://", pool)
+                session.headers.update(adapter.headers)
+                self.sessions[adapter.name] = session
+            return self.sessions[adapter.name]
+
+    def fetch(self, adapter: SiteAdapter, task: Task) -> Tuple[int, str]:
+        resp = self._session(adapter).get(task.url, timeout=TIMEOUT_S)
+        Metrics.observe("response_bytes", len(resp.content), site=adapter.name, stage=task.kind)
+        return resp.status_code, resp.text
+
+    def close(self) -> None:
+        for session in self.sessions.values():
+            session.close()
+
+
+class BrowserPool:
+    """Drivers shared by all browser sites, created on first use."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.idle: "queue.Queue" = queue.Queue()
+        self.created: List[object] = []
+        self.lock = threading.Lock()
+
+    def fetch(self, adapter: SiteAdapter, task: Task) -> Tuple[int, str]:
+        driver = self._checkout(adapter)
+        try:
+            driver.get(task.url)
+            adapter.prepare(driver, task)
+            page = driver.page_source
+        except Exception:
+            # a wedged browser is replaced rather than handed to the next task
+            self._discard(driver)
+            raise
+        self.idle.put(driver)
+        Metrics.observe("response_bytes", len(page), site=adapter.name, stage=task.kind)
+        return 200, page
+
+    def _checkout(self, adapter: SiteAdapter):
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                if len(self.created) < self.size:
+                    driver = adapter.make_driver()
+                    self.created.append(driver)
+                    return driver
+            try:
+                return self.idle.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+    def _discard(self, driver) -> None:
+        with self.lock:
+            self.created.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        for driver in list(self.created):
+            self._discard(driver)
+
+# ────────── DEDUP & SINK ──────────
+
+
+class DedupIndex:
+    """Thread-safe set of ``site:ad_id`` keys already written or in flight."""
+
+    def __init__(self):
+        self.keys = set()
+        self.lock = threading.Lock()
+
+    def seed(self, adapter: SiteAdapter) -> int:
+        before = len(self.keys)
+        for path in adapter.outputs():
+            if not os.path.isfile(path):
+                continue
+            with open(path, newline="", encoding="utf-8") as f:
+                self.keys.update(f"{adapter.name}:{adapter.key(row['url'])}"
+                                 for row in csv.DictReader(f) if row.get("url"))
+        return len(self.keys) - before
+
+    def claim(self, key: str) -> bool:
+        """True the first time ``key`` is seen."""
+        with self.lock:
+            if key in self.keys:
+                return False
+            self.keys.add(key)
+            return True
+
+
+class CsvSink:
+    """Append-only CSV writer per output file, plus optional scoring / price history."""
+
+    def __init__(self):
+        self.files: Dict[str, tuple] = {}
+        self.rows: Dict[str, int] = {}       # site → rows written by this sink
+        self.scorers: Dict[str, object] = {}
+        self.history = None
+        if PRICE_HISTORY:
+            import PriceHistory
+            self.history = PriceHistory.PriceHistory(PRICE_HISTORY)
+            self.history_sources = PriceHistory.SOURCES
+        self.lock = threading.Lock()
+
+    def _open(self, adapter: SiteAdapter, task: Task, path: str):
+        with self.lock:
+            if path not in self.files:
+                new = not os.path.isfile(path)
+                f = open(path, "a", newline="", encoding="utf-8")
+                writer = csv.DictWriter(f, fieldnames=list(adapter.fieldnames), extrasaction="ignore")
+                if new:
+                    writer.writeheader()
+                    f.flush()
+                self.files[path] = (f, writer, threading.Lock())
+                if SCORE_MODEL_DIR:
+                    from InlineScoring import ScoringStage
+                    scored = path.replace(".csv", "_scored.csv")
+                    self.scorers[path] = ScoringStage(SCORE_MODEL_DIR, scored,
+                                                      region=adapter.region(task)).start()
+            return self.files[path]
+
+    def write(self, adapter: SiteAdapter, task: Task, row: dict) -> None:
+        path = adapter.output(task)
+        f, writer, lock = self._open(adapter, task, path)
+        with lock, Metrics.timer("write_seconds", site=adapter.name):
+            writer.writerow(row)
+            f.flush()
+            if FSYNC:
+                os.fsync(f.fileno())
+        with self.lock:
+            self.rows[adapter.name] = self.rows.get(adapter.name, 0) + 1
+        Metrics.inc("rows_written", site=adapter.name)
+        if path in self.scorers:
+            self.scorers[path].submit(row)
+        if self.history is not None and adapter.name in self.history_sources:
+            from Normalize import parse_number
+            from PriceHistory import NEW
+            self.history.record(adapter.name, adapter.key(task.url), parse_number(row.get("price")), NEW)
+
+    def close(self) -> None:
+        for scorer in self.scorers.values():
+            scorer.close()
+        for f, _, _ in self.files.values():
+            f.close()
+        if self.history is not None:
+            self.history.flush()
+
+# ────────── SCHEDULER ──────────
+
+
+class Scheduler:
+    """Per-site queues; hands out the next task whose site has capacity and is off cooldown."""
+
+    def __init__(self, adapters: Sequence[SiteAdapter], browsers: int):
+        self.adapters = {a.name: a for a in adapters}
+        self.queues = {a.name: {DETAIL: deque(), LIST: deque()} for a in adapters}
+        self.inflight = {a.name: 0 for a in adapters}
+        self.limit = {a.name: a.max_inflight for a in adapters}
+        self.browsers = browsers
+        self.browser_inflight = 0
+        self.next_at: Dict[Tuple[str, str], float] = {}
+        self.order = deque(self.adapters)
+        self.cond = threading.Condition()
+        self.total_inflight = 0
+        for a in adapters:
+            Metrics.gauge("queue_depth", lambda n=a.name: len(self.queues[n][DETAIL]),
+                          queue="detail", site=a.name)
+            Metrics.gauge("queue_depth", lambda n=a.name: len(self.queues[n][LIST]),
+                          queue="listing", site=a.name)
+
+    def put(self, task: Task) -> None:
+        with self.cond:
+            self.queues[task.site][task.kind].append(task)
+            self.cond.notify()
+
+    def get(self) -> Optional[Task]:
+        """Next task, blocking while everything eligible is throttled; None when the crawl is done."""
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                soonest = None
+                for _ in range(len(self.order)):
+                    site = self.order[0]
+                    self.order.rotate(-1)
+                    browser = self.adapters[site].needs_browser
+                    if self.inflight[site] >= self.limit[site] or (browser and self.browser_inflight >= self.browsers):
+                        continue
+                    for kind in (DETAIL, LIST):
+                        if not self.queues[site][kind]:
+                            continue
+                        at = self.next_at.get((site, kind), 0.0)
+                        if at > now:
+                            soonest = at if soonest is None else min(soonest, at)
+                            continue
+                        task = self.queues[site][kind].popleft()
+                        delay = self.adapters[site].delay.get(kind, 0.0)
+                        self.next_at[(site, kind)] = now + delay * random.uniform(1 - JITTER, 1 + JITTER)
+                        self.inflight[site] += 1
+                        self.total_inflight += 1
+                        self.browser_inflight += browser
+                        return task
+                if self.total_inflight == 0 and not any(q for qs in self.queues.values() for q in qs.values()):
+                    self.cond.notify_all()
+                    return None
+                self.cond.wait(None if soonest is None else max(soonest - now, 0.001))
+
+    def done(self, task: Task) -> None:
+        with self.cond:
+            self.inflight[task.site] -= 1
+            self.total_inflight -= 1
+            self.browser_inflight -= self.adapters[task.site].needs_browser
+            self.cond.notify_all()
+
+# ────────── ENGINE ──────────
+
+
+class Engine:
+    def __init__(self, adapters: Sequence[SiteAdapter], budget: Optional[dict] = None):
+        self.adapters = {a.name: a for a in adapters}
+        self.budget = {**BUDGET, **(budget or {})}
+        self.scheduler = Scheduler(adapters, self.budget["browsers"])
+        self.limiter = RateLimiter(self.budget["requests_per_s"])
+        self.http = HttpFetcher(self.budget["workers"])
+        self.browsers = BrowserPool(self.budget["browsers"])
+        self.dedup = DedupIndex()
+        self.sink = CsvSink()
+
+    def _fetch(self, adapter: SiteAdapter, task: Task) -> Optional[str]:
+        fetcher = self.browsers if adapter.needs_browser else self.http
+        for attempt in range(RETRIES + 1):
+            self.limiter.acquire()
+            try:
+                with Metrics.timer("fetch_seconds", site=adapter.name, stage=task.kind):
+                    status, html = fetcher.fetch(adapter, task)
+            except Exception as e:
+                status, html = "error", None
+                print(f"   ⚠️  {adapter.name} {task.url} — {e}")
+            if status == 200 and not adapter.complete(html, task):
+                status = "incomplete"
+            Metrics.inc("http_responses", site=adapter.name, stage=task.kind, status=status)
+            if status == 200:
+                return html
+            if isinstance(status, int) and 400 <= status < 500 and status != 429:
+                return None
+            if attempt < RETRIES:
+                with Metrics.timer("sleep_seconds", site=adapter.name, stage="backoff"):
+                    time.sleep(min(BACKOFF_S * 2 ** attempt, 60.0))
+        return None
+
+    def _handle(self, task: Task) -> None:
+        adapter = self.adapters[task.site]
+        html = self._fetch(adapter, task)
+        if html is None:
+            Metrics.inc("pages", site=adapter.name, stage=task.kind, outcome="failed")
+            return
+        with Metrics.timer("parse_seconds", site=adapter.name, stage=task.kind):
+            if task.kind == LIST:
+                links, next_task = adapter.parse_listing(html, task)
+            else:
+                row = adapter.parse_detail(html, task)
+        Metrics.inc("pages", site=adapter.name, stage=task.kind, outcome="ok")
+
+        if task.kind == LIST:
+            new = 0
+            for url in links:
+                if self.dedup.claim(f"{adapter.name}:{adapter.key(url)}"):
+                    self.scheduler.put(Task(adapter.name, DETAIL, url, task.meta))
+                    new += 1
+            Metrics.inc("links_new", new, site=adapter.name)
+            if next_task is not None:
+                self.scheduler.put(next_task)
+        elif row:
+            self.sink.write(adapter, task, row)
+
+    def _worker(self) -> None:
+        while True:
+            task = self.scheduler.get()
+            if task is None:
+                return
+            try:
+                self._handle(task)
+            except Exception as e:
+                Metrics.inc("pages", site=task.site, stage=task.kind, outcome="error")
+                print(f"   ⚠️  {task.site} {task.url} — {e}")
+            finally:
+                self.scheduler.done(task)
+
+    def run(self) -> Dict[str, int]:
+        """Crawl every adapter to exhaustion; returns rows written per site."""
+        for adapter in self.adapters.values():
+            known = self.dedup.seed(adapter)
+            seeds = list(adapter.seeds())
+            print(f"➜ {adapter.name}: {len(seeds)} seed pages, {known:,} ads already collected")
+            for task in seeds:
+                self.scheduler.put(task)
+        workers = [threading.Thread(target=self._worker, name=f"crawl-{i}", daemon=True)
+                   for i in range(self.budget["workers"])]
+        try:
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+        finally:
+            self.sink.close()
+            self.http.close()
+            self.browsers.close()
+        return {name: self.sink.rows.get(name, 0) for name in self.adapters}
+
+# ────────── MAIN ──────────
+
+
+def main(argv=None) -> None:
+    import CrawlSites
+
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--site", action="append", choices=sorted(CrawlSites.SITES),
+                    help="repeatable; default all")
+    ap.add_argument("--workers", type=int, default=BUDGET["workers"])
+    ap.add_argument("--browsers", type=int, default=BUDGET["browsers"])
+    ap.add_argument("--rps", type=float, default=BUDGET["requests_per_s"], help="global requests/s")
+    args = ap.parse_args(argv)
+
+    Metrics.serve(METRICS_PORT)
+    adapters = [CrawlSites.SITES[name]() for name in (args.site or sorted(CrawlSites.SITES))]
+    engine = Engine(adapters, {"workers": args.workers, "browsers": args.browsers,
+                               "requests_per_s": args.rps})
+    written = engine.run()
+    print(Metrics.summary())
+    print("🎉 " + ", ".join(f"{site}: {n:,} new rows" for site, n in written.items()))
+
+
+if __name__ == "__main__":
+    main()
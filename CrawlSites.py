@@ -0,0 +1,171 @@
+"""
+Site adapters for CrawlEngine.py
+================================
+Each marketplace only says where its listing pages are and how to read them;
+fetching, pacing, retries, dedup and CSV output are the engine's job.
+
+• ``SubitoSite``    – one listing crawl per region (``?o=N`` pagination until a
+  page has no ads), detail pages parsed by DataCollector.parse_dettaglio_pagina,
+  rows in ``subito_cars_<regione>.csv`` exactly as DataCollector.py writes them.
+• ``AutoScoutSite`` – one listing crawl per spaced ZIP (``&page=N`` until a page
+  adds no new ads), through the browser pool, rows parsed by
+  GermanyDataCollector.parse_listing_details into ``AUTOSCOUT_CSV`` – not
+  GermanyDataCollector's OUTPUT_CSV, which that script truncates on start.
+
+Defaults (regions, ZIPs, page limits, delays) come from the CONFIG blocks of
+DataCollector.py / GermanyDataCollector.py, which are imported on first use.
+A new marketplace is a SiteAdapter subclass registered in ``SITES``.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, quote_plus, urlencode, urljoin, urlparse, urlunparse
+
+from CrawlEngine import DETAIL, LIST, SiteAdapter, Task
+from Normalize import ad_id_from_url
+
+# ───────────────────── CONFIG ─────────────────────
+AUTOSCOUT_CSV = "AutoScout24_engine.csv"   # append-only output of AutoScoutSite
+# ─────────────────────────────────────────────────
+
+
+class SubitoSite(SiteAdapter):
+    name = "subito"
+
+    def __init__(self, regions: Optional[Sequence[str]] = None, base: Optional[str] = None,
+                 max_pages: Optional[int] = None, output_dir: str = "."):
+        import DataCollector as dc
+        self.dc = dc
+        self.regions = list(regions or dc.REGIONI)
+        self.base = base or dc.SUBITO_BASE
+        self.max_pages = max_pages or dc.MAX_PAGES
+        self.output_dir = output_dir
+        self.fieldnames = dc.CAMPI_DETTAGLIO
+        self.headers = dc.REQUEST_HEADERS
+        self.max_inflight = dc.MAX_WORKERS
+        self.delay = {LIST: dc.LISTING_DELAY, DETAIL: 0.0}
+
+    def seeds(self) -> Iterable[Task]:
+        for regione in self.regions:
+            yield Task(self.name, LIST, f"{self.base}/annunci-{regione}/vendita/auto/",
+                       {"region": regione, "page": 1})
+
+    def parse_listing(self, html: str, task: Task) -> Tuple[Iterable[str], Optional[Task]]:
+        links = self.dc.estrai_link_da_pagina(html, base=self.base)
+        page = task.meta["page"]
+        if not links or page >= self.max_pages:
+            return links, None
+        first = f"{self.base}/annunci-{task.meta['region']}/vendita/auto/"
+        return links, Task(self.name, LIST, f"{first}?o={page + 1}", {**task.meta, "page": page + 1})
+
+    def parse_detail(self, html: str, task: Task) -> Optional[dict]:
+        record = self.dc.parse_dettaglio_pagina(html, task.url)
+        return record if record["brand_model"] or record["price"] else None
+
+    def key(self, url: str) -> str:
+        return ad_id_from_url(url) or url
+
+    def output(self, task: Task) -> str:
+        return os.path.join(self.output_dir, f"subito_cars_{task.meta['region']}.csv")
+
+    def outputs(self) -> Iterable[str]:
+        return [os.path.join(self.output_dir, f"subito_cars_{r}.csv") for r in self.regions]
+
+    def region(self, task: Task) -> Optional[str]:
+        return task.meta.get("region")
+
+
+class AutoScoutSite(SiteAdapter):
+    name = "autoscout"
+    needs_browser = True
+    max_inflight = 2
+    delay = {LIST: 1.0, DETAIL: 0.7}   # ≈ the human_delay pauses of GermanyDataCollector
+
+    def __init__(self, zips: Optional[List[tuple]] = None, base_mask: Optional[str] = None,
+                 max_pages: Optional[int] = None, output: Optional[str] = None,
+                 driver_factory=None, consent: bool = True):
+        import GermanyDataCollector as gc
+        self.gc = gc
+        self._zips = zips
+        self.base_mask = base_mask or gc.BASE_MASK
+        self.max_pages = max_pages or gc.MAX_PAGES
+        self.output_csv = output or AUTOSCOUT_CSV
+        self.fieldnames = gc.HEADER
+        self.driver_factory = driver_factory or (lambda: gc.make_driver(gc.HEADLESS))
+        self.consent = consent
+        self._consented = set()
+
+    @property
+    def zips(self) -> List[tuple]:
+        if self._zips is None:
+            gc = self.gc
+            self._zips = gc.load_unique_zip_rows(gc.CSV_ZIPCODES, gc.ZIP_LIMIT)[gc.START_FROM_IDX - 1:]
+        return self._zips
+
+    def seeds(self) -> Iterable[Task]:
+        for zip_code, lat, lon in self.zips:
+            url = self.base_mask.format(lat=lat, lon=lon, zip=quote_plus(zip_code))
+            yield Task(self.name, LIST, url, {"zip": zip_code, "page": 1, "seen": set()})
+
+    def parse_listing(self, html: str, task: Task) -> Tuple[Iterable[str], Optional[Task]]:
+        from bs4 import BeautifulSoup
+        links = set()
+        for card in BeautifulSoup(html, "lxml").select('article[data-testid="list-item"]'):
+            a = card.find("a", href=True)
+            if a:
+                links.add(urljoin(task.url, a["href"]).split("?")[0])
+        seen, page = task.meta["seen"], task.meta["page"]
+        new = links - seen
+        seen |= links
+        if not new or page >= self.max_pages:
+            return new, None
+        parsed = urlparse(task.url)
+        qs = parse_qs(parsed.query)
+        qs["page"] = [str(page + 1)]
+        url = urlunparse(parsed._replace(query=urlencode(qs, doseq=True)))
+        return new, Task(self.name, LIST, url, {**task.meta, "page": page + 1})
+
+    def parse_detail(self, html: str, task: Task) -> Optional[dict]:
+        row = self.gc.parse_listing_details(html, task.url)
+        return dict(zip(self.fieldnames, row)) if row else None
+
+    def key(self, url: str) -> str:
+        return ad_id_from_url(url) or url
+
+    def complete(self, html: str, task: Task) -> bool:
+        # list and detail pages are both Next.js renders; a wall / error page is not
+        return "__NEXT_DATA__" in html
+
+    def output(self, task: Task) -> str:
+        return self.output_csv
+
+    def outputs(self) -> Iterable[str]:
+        return [self.output_csv]
+
+    def make_driver(self):
+        return self.driver_factory()
+
+    def prepare(self, driver, task: Task) -> None:
+        """Accept cookies once per browser; on list pages scroll until no more cards load."""
+        if self.consent and id(driver) not in self._consented:
+            self.gc.click_if_visible(
+                driver, '//button[contains(.,"Alle akzeptieren") or contains(.,"Alles akzeptieren")]')
+            self._consented.add(id(driver))
+        if task.kind != LIST:
+            return
+        from selenium.webdriver.common.by import By
+        prev = -1
+        while True:
+            cards = len(driver.find_elements(By.CSS_SELECTOR, 'article[data-testid="list-item"]'))
+            if cards == prev:
+                break
+            prev = cards
+            driver.execute_script("window.scrollBy(0, window.innerHeight);")
+            time.sleep(random.uniform(self.gc.HUMAN_MIN, self.gc.HUMAN_MAX))
+
+
+SITES = {"subito": SubitoSite, "autoscout": AutoScoutSite}
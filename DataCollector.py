@@ -4,12 +4,17 @@
 import re
 import time
 import csv
+import json
 import os
 import requests
 import threading
 from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import Metrics
+from InlineScoring import ScoringStage
+from Normalize import ad_id_from_url, parse_number, split_make_model
+
 # ---------- CONFIGURAZIONI ----------
 # Lista di tutte le regioni italiane nel formato utilizzato da Subito.it
 REGIONI = [ "basilicata", "calabria", "campania", "emilia-romagna",
@@ -23,6 +28,13 @@ REGIONI = [ "basilicata", "calabria", "campania", "emilia-romagna",
 MAX_LINKS = 100000   # Numero massimo di annunci da estrarre per regione
 MAX_PAGES = 300      # Numero massimo di pagine di ricerca da scandire per regione
 MAX_WORKERS = 20      # Numero di thread per il parsing dei dettagli
+SCORE_MODEL_DIR = None  # Cartella del modello compilato (CompiledModel.py) per lo scoring inline; None = disattivato
+METRICS_PORT = 9108   # Endpoint locale Prometheus/JSON delle metriche (None = disattivato)
+SUBITO_BASE = "https://www.subito.it"   # Host da scandire (MockMarketplace.py lo sostituisce nei benchmark)
+LISTING_DELAY = 0.5   # Pausa in secondi tra due pagine di elenco
+PRICE_HISTORY = None  # File dello storico prezzi append-only (PriceHistory.py), es. "price_history.bin"; None = disattivato
+RECHECK_BUDGET = 1000 # Annunci noti, assenti dagli elenchi, da ricontrollare per regione (priorità di PriceHistory)
+PARSER_BACKEND = "html.parser"  # "html.parser", "lxml" o "next_data" (JSON incorporato) – confronto in ParserBench.py
 # --------------------------------------
 
 # Header HTTP aggiornati secondo i nuovi dati forniti
@@ -48,26 +60,101 @@ REQUEST_HEADERS = {
     "accept-encoding": "gzip, deflate, br"
 }
 
-def estrai_link_da_pagina(html: str) -> set:
+def http_get(url: str, stage: str) -> requests.Response:
+    """
+    requests.get con metriche: latenza (fetch_seconds), byte scaricati
+    (response_bytes) e conteggio degli status code (http_responses).
+    Solleva le stesse eccezioni di requests / raise_for_status.
+    """
+    t0 = time.perf_counter()
+    try:
+        resp = requests.get(url, headers=REQUEST_HEADERS, timeout=10)
+    except Exception:
+        Metrics.inc("http_responses", stage=stage, status="error")
+        raise
+    finally:
+        Metrics.observe("fetch_seconds", time.perf_counter() - t0, stage=stage)
+    Metrics.inc("http_responses", stage=stage, status=resp.status_code)
+    Metrics.observe("response_bytes", len(resp.content), stage=stage)
+    resp.raise_for_status()
+    return resp
+
+def estrai_next_data(html: str):
+    """
+    Ritorna il JSON incorporato nello <script id="__NEXT_DATA__"> della pagina
+    (Subito è un'app Next.js), oppure None se assente o non valido.
+    """
+    m = re.search(r'<script[^>]+id="__NEXT_DATA__"[^>]*>(.*?)</script>', html, re.S)
+    if not m:
+        return None
+    try:
+        return json.loads(m.group(1))
+    except ValueError:
+        return None
+
+def _bs_parser(backend: str = None) -> str:
+    """Parser di BeautifulSoup per il backend scelto ("next_data" ripiega su html.parser)."""
+    backend = backend or PARSER_BACKEND
+    return "html.parser" if backend == "next_data" else backend
+
+def estrai_link_da_pagina(html: str, backend: str = None, base: str = None) -> set:
     """
     Estrae tutti i link di dettaglio annunci (es. https://www.subito.it/auto/… .htm)
     dal codice HTML di una pagina di elenco.
+    backend: parser di BeautifulSoup ("html.parser", "lxml") oppure "next_data"
+    per leggere gli URL dal JSON incorporato (fallback su html.parser se manca).
+    base: host dei link da accettare (default SUBITO_BASE).
     Ritorna un set di URL unici.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    backend = backend or PARSER_BACKEND
+    pattern = re.compile(rf"^{re.escape(base or SUBITO_BASE)}/auto/.*\.htm$")
+    if backend == "next_data":
+        dati = estrai_next_data(html)
+        if dati is not None:
+            elementi = (dati.get("props", {}).get("pageProps", {}).get("initialState", {})
+                        .get("items", {}).get("list", []))
+            return {
+                e["item"]["urls"]["default"] for e in elementi
+                if pattern.match(e.get("item", {}).get("urls", {}).get("default", ""))
+            }
+
+    soup = BeautifulSoup(html, _bs_parser(backend))
     links = set()
-    pattern = re.compile(r"^https://www\.subito\.it/auto/.*\.htm$")
     for a in soup.find_all("a", href=True):
         href = a["href"].strip()
         if pattern.match(href):
             links.add(href)
     return links
 
-def estrai_link_da_listings(base_url: str, max_links: int = MAX_LINKS, max_pages: int = MAX_PAGES) -> list:
+def estrai_prezzi_da_pagina(html: str) -> dict:
+    """
+    "Snapshot" economico di una pagina di elenco: {url annuncio: prezzo in €}
+    letto dal JSON __NEXT_DATA__ (feature "/price" di ogni annuncio), senza
+    scaricare i dettagli. Dizionario vuoto se il JSON manca.
+    """
+    dati = estrai_next_data(html)
+    if dati is None:
+        return {}
+    elementi = (dati.get("props", {}).get("pageProps", {}).get("initialState", {})
+                .get("items", {}).get("list", []))
+    prezzi = {}
+    for e in elementi:
+        item = e.get("item", {})
+        url = item.get("urls", {}).get("default")
+        valori = item.get("features", {}).get("/price", {}).get("values") or [{}]
+        prezzo = parse_number(valori[0].get("key")) or parse_number(valori[0].get("value"))
+        if url and prezzo:
+            prezzi[url] = prezzo
+    return prezzi
+
+def estrai_link_da_listings(base_url: str, max_links: int = MAX_LINKS, max_pages: int = MAX_PAGES,
+                            snapshot: dict = None) -> list:
     """
     Scorre fino a max_pages pagine di elenco (a partire da base_url),
     estrae i link di dettaglio finché non raggiunge max_links.
     Se una pagina restituisce zero link, interrompe l'iterazione per quella regione.
+    Se snapshot è un dizionario, lo riempie con i prezzi visti negli elenchi
+    (estrai_prezzi_da_pagina).
     Ritorna una lista di URL (al più max_links).
     """
     tutti_links = []
@@ -80,13 +167,15 @@ def estrai_link_da_listings(base_url: str, max_links: int = MAX_LINKS, max_pages
             url = f"{base_url}?o={pagina}"
         print(f"  Aprendo pagina {pagina}: {url}")
         try:
-            resp = requests.get(url, headers=REQUEST_HEADERS, timeout=10)
-            resp.raise_for_status()
+            resp = http_get(url, "listing")
         except Exception as e:
             print(f"    Errore HTTP sulla pagina {pagina}: {e}")
             break
 
-        nuovi = estrai_link_da_pagina(resp.text)
+        with Metrics.timer("parse_seconds", stage="listing"):
+            nuovi = estrai_link_da_pagina(resp.text)
+            if snapshot is not None:
+                snapshot.update(estrai_prezzi_da_pagina(resp.text))
         if not nuovi:
             print("    → Nessun annuncio trovato, interrompo per questa regione.")
             break
@@ -99,14 +188,16 @@ def estrai_link_da_listings(base_url: str, max_links: int = MAX_LINKS, max_pages
                 tutti_links.append(link)
         print(f"    → Trovati {len(tutti_links) - prima_len} nuovi link (totale: {len(tutti_links)})")
         pagina += 1
-        time.sleep(0.5)
+        with Metrics.timer("sleep_seconds", stage="listing"):
+            time.sleep(LISTING_DELAY)
 
     print(f"  Totale link recuperati: {len(tutti_links)} (max {max_links})")
     return tutti_links[:max_links]
 
-def parse_dettaglio_auto_html(html: str) -> dict:
+def parse_dettaglio_auto_html(html, backend: str = None) -> dict:
     """
-    Dato l'HTML di una pagina di dettaglio annuncio, estrae i campi 'Dati principali':
+    Dato l'HTML (o la BeautifulSoup già costruita) di una pagina di dettaglio
+    annuncio, estrae i campi 'Dati principali':
       - year (data di prima immatricolazione)
       - mileage (Km)
       - fuel_type (Benzina, Diesel, ecc.)
@@ -115,7 +206,7 @@ def parse_dettaglio_auto_html(html: str) -> dict:
       - body_type (SUV/Fuoristrada, Berlina, ecc.)
     Ritorna un dizionario con queste chiavi (valori None se non trovati).
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = html if isinstance(html, BeautifulSoup) else BeautifulSoup(html, _bs_parser(backend))
 
     titolo_feat = soup.find("h6", string=re.compile(r"^\s*Dati principali\s*$", re.IGNORECASE))
     if not titolo_feat:
@@ -177,38 +268,64 @@ def parse_dettaglio_auto_html(html: str) -> dict:
 
     return campi
 
-def parse_dettaglio_auto(url: str) -> dict:
+CAMPI_DETTAGLIO = ["url", "brand_model", "price", "year", "mileage", "fuel_type",
+                   "transmission", "emission_standard", "body_type", "description"]
+
+# Icona della feature in "Dati principali" / chiave in __NEXT_DATA__ → campo del record
+FEATURE_CAMPI = {
+    "register_date": "year",
+    "mileage_scalar": "mileage",
+    "fuel": "fuel_type",
+    "gearbox": "transmission",
+    "pollution": "emission_standard",
+    "car_type": "body_type",
+}
+
+def parse_dettaglio_next_data(html: str, url: str):
     """
-    Effettua una richiesta GET all'URL di dettaglio annuncio, quindi:
+    Estrae il record dal JSON __NEXT_DATA__ della pagina di dettaglio
+    (props.pageProps.initialState.detail.item: subject, body, features, urls),
+    senza costruire il DOM. Ritorna None se il JSON manca o non contiene l'annuncio.
+    """
+    dati = estrai_next_data(html)
+    item = ((dati or {}).get("props", {}).get("pageProps", {}).get("initialState", {})
+            .get("detail", {}).get("item"))
+    if not item:
+        return None
+
+    def valore(chiave):
+        valori = item.get("features", {}).get(f"/{chiave}", {}).get("values") or [{}]
+        return valori[0].get("value") or None
+
+    record = dict.fromkeys(CAMPI_DETTAGLIO)
+    record["url"] = item.get("urls", {}).get("default") or url
+    record["brand_model"] = (item.get("subject") or "").strip() or None
+    record["price"] = valore("price")
+    record["description"] = (item.get("body") or "").strip() or None
+    for chiave, campo in FEATURE_CAMPI.items():
+        record[campo] = valore(chiave)
+    return record
+
+def parse_dettaglio_pagina(html: str, url: str, backend: str = None) -> dict:
+    """
+    Parsing puro (senza rete) di una pagina di dettaglio annuncio:
       - Estrae il titolo (marca+modello) dal <h1>
       - Estrae il prezzo dal paragrafo con classe "AdInfo_price__…"
       - Estrae l'URL canonico dal <link rel="canonical">
       - Estrae la descrizione dal paragrafo con classe "AdDescription_description__…"
-      - Chiama parse_dettaglio_auto_html() sui 'Dati principali'
-    Ritorna un dizionario con tutti i campi raccolti.
+      - Chiama parse_dettaglio_auto_html() sui 'Dati principali' (stessa soup)
+    Con backend "next_data" legge gli stessi campi dal JSON incorporato e
+    ripiega sull'HTML se il JSON non c'è.
     """
-    record = {
-        "url": url,
-        "brand_model": None,
-        "price": None,
-        "year": None,
-        "mileage": None,
-        "fuel_type": None,
-        "transmission": None,
-        "emission_standard": None,
-        "body_type": None,
-        "description": None
-    }
+    backend = backend or PARSER_BACKEND
+    if backend == "next_data":
+        record = parse_dettaglio_next_data(html, url)
+        if record is not None:
+            return record
 
-    try:
-        resp = requests.get(url, headers=REQUEST_HEADERS, timeout=10)
-        resp.raise_for_status()
-    except Exception as e:
-        print(f"    Errore HTTP dettaglio {url}: {e}")
-        return record
-
-    html = resp.text
-    soup = BeautifulSoup(html, "html.parser")
+    record = dict.fromkeys(CAMPI_DETTAGLIO)
+    record["url"] = url
+    soup = BeautifulSoup(html, _bs_parser(backend))
 
     # URL canonico
     canon = soup.find("link", {"rel": "canonical"})
@@ -231,77 +348,275 @@ def parse_dettaglio_auto(url: str) -> dict:
         record["description"] = p_desc.get_text(separator=" ", strip=True)
 
     # Dati principali
-    dati_principali = parse_dettaglio_auto_html(html)
-    record.update(dati_principali)
+    record.update(parse_dettaglio_auto_html(soup))
+    return record
+
+def parse_dettaglio_auto(url: str) -> dict:
+    """
+    Effettua una richiesta GET all'URL di dettaglio annuncio e ne estrae i campi
+    con parse_dettaglio_pagina() (backend PARSER_BACKEND).
+    Ritorna un dizionario con tutti i campi raccolti.
+    """
+    try:
+        resp = http_get(url, "detail")
+    except Exception as e:
+        print(f"    Errore HTTP dettaglio {url}: {e}")
+        record = dict.fromkeys(CAMPI_DETTAGLIO)
+        record["url"] = url
+        return record
+
+    t0 = time.perf_counter()
+    record = parse_dettaglio_pagina(resp.text, url)
+    Metrics.observe("parse_seconds", time.perf_counter() - t0, stage="detail")
+
+    # Resa per campo: quante pagine hanno restituito ciascun campo
+    for campo, valore in record.items():
+        Metrics.inc("fields_extracted" if valore else "fields_missing", field=campo)
 
     return record
 
-if __name__ == "__main__":
+# Testo delle pagine di Subito per gli annunci scaduti, venduti o cancellati
+ANNUNCIO_SCADUTO = re.compile(
+    r"annuncio (non (è )?più disponibile|scaduto|rimosso|eliminato)|non è più online",
+    re.IGNORECASE)
+
+def ricontrolla_annuncio(url: str):
+    """
+    Riscarica un annuncio già noto. Ritorna (record, False) se è ancora online,
+    (None, True) se è stato rimosso/venduto (404/410 o pagina che dice che
+    l'annuncio è scaduto), (None, False) se il controllo non è riuscito –
+    anche una pagina 200 senza titolo né prezzo (blocco, captcha, layout
+    cambiato) conta come errore, non come annuncio rimosso.
+    """
+    try:
+        resp = http_get(url, "recheck")
+    except requests.HTTPError as e:
+        return None, e.response is not None and e.response.status_code in (404, 410)
+    except Exception as e:
+        print(f"    Errore HTTP ricontrollo {url}: {e}")
+        return None, False
+
+    with Metrics.timer("parse_seconds", stage="recheck"):
+        record = parse_dettaglio_pagina(resp.text, url)
+    if not record["brand_model"] and not record["price"]:
+        scaduto = ANNUNCIO_SCADUTO.search(resp.text) is not None
+        if not scaduto:
+            print(f"    Ricontrollo senza annuncio né avviso di scadenza: {url}")
+        return None, scaduto
+    return record, False
+
+def pianifica_ricontrolli(noti: dict, stato: dict, visti: set, budget: int) -> list:
+    """
+    Sceglie al più `budget` annunci noti (url → brand_model) non visti negli
+    elenchi di questo giro, in ordine di PriceHistory.recheck_priority():
+    i più vecchi prima, favorendo prezzi instabili e modelli molto richiesti.
+    """
+    import PriceHistory
+
+    if budget <= 0 or not len(stato["ad"]):
+        return []
+    indice = {int(ad): i for i, ad in enumerate(stato["ad"])}
+    modelli = {url: split_make_model(bm) for url, bm in noti.items()}
+    domanda = {}
+    for modello in modelli.values():
+        domanda[modello] = domanda.get(modello, 0) + 1
+    massimo = max(domanda.values())
+
+    candidati, righe, richiesta = [], [], []
+    for url in noti:
+        i = indice.get(PriceHistory.ad_key(ad_id_from_url(url) or url))
+        if url in visti or i is None:
+            continue
+        candidati.append(url)
+        righe.append(i)
+        richiesta.append(domanda[modelli[url]] / massimo)
+    if not candidati:
+        return []
+    sotto_stato = {k: v[righe] for k, v in stato.items()}
+    priorita = PriceHistory.recheck_priority(sotto_stato, richiesta)
+    ordine = sorted(range(len(candidati)), key=lambda j: -priorita[j])
+    return [candidati[j] for j in ordine[:budget] if priorita[j] > 0]
+
+def elabora_regione(regione: str, lock: threading.Lock, output_csv: str = None) -> int:
+    """
+    Estrae i link di una regione, parsa in parallelo i dettagli nuovi e li
+    aggiunge al CSV della regione (subito_cars_<regione>.csv di default).
+    Con PRICE_HISTORY attivo aggiorna anche gli annunci già noti:
+      - i prezzi visti negli elenchi vengono confrontati con l'ultimo prezzo
+        registrato; il dettaglio si riscarica solo se il prezzo è cambiato
+      - fino a RECHECK_BUDGET annunci noti non visti negli elenchi vengono
+        ricontrollati per priorità (rimossi → evento "gone")
+    Ogni osservazione finisce nello storico prezzi, il CSV resta una riga per annuncio.
+    Ritorna il numero di annunci presenti nel CSV alla fine.
+    """
+    base_listing = f"{SUBITO_BASE}/annunci-{regione}/vendita/auto/"
+    print(f"\n=== Elaborazione regione: {regione} ===")
+    print(f"> Base URL: {base_listing}")
+
+    # Definisci il file di output per la regione
+    output_csv = output_csv or f"subito_cars_{regione}.csv"
+    processed_urls = set()
+    noti = {}   # url → brand_model degli annunci già nel CSV
+    file_exists = os.path.isfile(output_csv)
+
+    # Se esiste già il file, carichiamo gli URL già processati
+    if file_exists:
+        with open(output_csv, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                if row.get("url"):
+                    processed_urls.add(row["url"])
+                    noti[row["url"]] = (row.get("brand_model"), row.get("price"))
+
+    # Storico prezzi: gli annunci del CSV mai osservati prima entrano con il
+    # prezzo del CSV, datati all'ultima scrittura del file
+    # (import solo se attivo: PriceHistory carica numpy, ~100 ms di avvio)
+    storico = None
+    if PRICE_HISTORY:
+        import PriceHistory
+        storico = PriceHistory.PriceHistory(PRICE_HISTORY)
+    ultimo_prezzo = {}
+    if storico is not None:
+        stato = storico.state("subito")
+        gia_visti = set(stato["ad"].tolist())
+        mtime = os.path.getmtime(output_csv) if file_exists else time.time()
+        for url, (_, prezzo) in noti.items():
+            ad_id = ad_id_from_url(url) or url
+            if PriceHistory.ad_key(ad_id) not in gia_visti:
+                storico.record("subito", ad_id, parse_number(prezzo), PriceHistory.NEW, ts=mtime)
+        stato = storico.state("subito")
+        ultimo_prezzo = dict(zip(stato["ad"].tolist(), stato["last_price"].tolist()))
+
+    # Apriamo il CSV in append o write, a seconda che esista o meno
+    mode = "a" if file_exists else "w"
+    csvfile = open(output_csv, mode, newline="", encoding="utf-8")
+    fieldnames = CAMPI_DETTAGLIO
+    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    if not file_exists:
+        writer.writeheader()
+        csvfile.flush()
+
+    # Stage opzionale di scoring: gira su un suo thread con coda limitata
+    scorer = None
+    if SCORE_MODEL_DIR:
+        scorer = ScoringStage(SCORE_MODEL_DIR, f"subito_scored_{regione}.csv", region=regione).start()
+        Metrics.gauge("queue_depth", scorer.queue.qsize, queue="scoring")
+
+    # 1) Estrai fino a MAX_LINKS URL di dettaglio per questa regione
+    #    (con i prezzi degli elenchi come snapshot se lo storico è attivo)
+    snapshot = {} if storico is not None else None
+    link_annunci = estrai_link_da_listings(base_listing, MAX_LINKS, MAX_PAGES, snapshot)
+    print(f">> Totale link da processare per {regione}: {len(link_annunci)}\n")
+
+    # 2) Filtriamo i link già processati
+    da_processare = [url for url in link_annunci if url not in processed_urls]
+    print(f">> {len(da_processare)} nuovi annunci da parsare.\n")
+
+    # 2b) Annunci noti: confronto con lo snapshot + ricontrolli per priorità
+    da_ricontrollare = []
+    if storico is not None:
+        for url, prezzo in snapshot.items():
+            if url not in processed_urls:
+                continue
+            ad_id = ad_id_from_url(url) or url
+            if ultimo_prezzo.get(PriceHistory.ad_key(ad_id), -1) in (-1, round(prezzo)):
+                storico.record("subito", ad_id, prezzo, PriceHistory.SEEN)
+                Metrics.inc("snapshot", outcome="same")
+            else:
+                da_ricontrollare.append(url)
+                Metrics.inc("snapshot", outcome="changed")
+        cambiati = len(da_ricontrollare)
+        da_ricontrollare += pianifica_ricontrolli(
+            {url: bm for url, (bm, _) in noti.items()}, stato, set(snapshot), RECHECK_BUDGET)
+        print(f">> {cambiati} prezzi cambiati negli elenchi, "
+              f"{len(da_ricontrollare) - cambiati} annunci noti da ricontrollare.\n")
+
+    # 3) Lanciamo un ThreadPoolExecutor per processare in parallelo
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        future_to_url = {
+            executor.submit(parse_dettaglio_auto, url): url
+            for url in da_processare
+        }
+        future_to_url.update({
+            executor.submit(ricontrolla_annuncio, url): url
+            for url in da_ricontrollare
+        })
+        # Profondità della coda: dettagli ancora da completare (calcolata solo alla lettura)
+        Metrics.gauge("queue_depth", lambda: sum(not f.done() for f in future_to_url), queue="detail")
+
+        for future in as_completed(future_to_url):
+            url = future_to_url[future]
+            try:
+                risultato = future.result()
+            except Exception as e:
+                print(f"    Errore nel thread per {url}: {e}")
+                continue
+
+            if isinstance(risultato, tuple):
+                registra_ricontrollo(storico, scorer, url, *risultato, ultimo_prezzo)
+                continue
+            record = risultato
+
+            # Scriviamo il risultato nel CSV sotto lock
+            with lock:
+                if record["url"] not in processed_urls:
+                    with Metrics.timer("write_seconds", stage="detail"):
+                        writer.writerow({k: record.get(k, "") for k in fieldnames})
+                        csvfile.flush()
+                    Metrics.inc("rows_written", region=regione)
+                    processed_urls.add(record["url"])
+                    print(f"    Salvato: {record['url']}")
+                    if storico is not None:
+                        storico.record("subito", ad_id_from_url(record["url"]) or record["url"],
+                                       parse_number(record["price"]), PriceHistory.NEW)
+                    if scorer:
+                        scorer.submit(record)
+
+    if scorer:
+        scorer.close()
+        Metrics.remove_gauge("queue_depth", queue="scoring")
+    if storico is not None:
+        storico.flush()
+    csvfile.close()
+    print(f">> Esportazione completata: {len(processed_urls)} annunci salvati in '{output_csv}'")
+    return len(processed_urls)
+
+def registra_ricontrollo(storico, scorer, url: str, record, rimosso: bool, ultimo_prezzo: dict) -> None:
+    """Registra nello storico l'esito di ricontrolla_annuncio(); i prezzi cambiati vanno allo scoring."""
+    import PriceHistory
+
+    ad_id = ad_id_from_url(url) or url
+    if rimosso:
+        storico.record("subito", ad_id, None, PriceHistory.GONE)
+        Metrics.inc("recheck", outcome="gone")
+        print(f"    Rimosso: {url}")
+        return
+    prezzo = parse_number(record["price"]) if record else None
+    if prezzo is None:
+        Metrics.inc("recheck", outcome="error")
+        return
+    precedente = ultimo_prezzo.get(PriceHistory.ad_key(ad_id), -1)
+    if precedente in (-1, round(prezzo)):
+        storico.record("subito", ad_id, prezzo, PriceHistory.SEEN)
+        Metrics.inc("recheck", outcome="same")
+        return
+    storico.record("subito", ad_id, prezzo, PriceHistory.CHANGED)
+    Metrics.inc("recheck", outcome="changed")
+    print(f"    Prezzo cambiato: {url} ({precedente} → {round(prezzo)} €)")
+    if scorer:
+        scorer.submit(record)
+
+def main():
+    Metrics.serve(METRICS_PORT)
+
     # Creiamo un lock per sincronizzare l'accesso al CSV e al set di URL processati
     lock = threading.Lock()
 
     # Per ciascuna regione, estraiamo e salviamo in un CSV dedicato
     for regione in REGIONI:
-        base_listing = f"https://www.subito.it/annunci-{regione}/vendita/auto/"
-        print(f"\n=== Elaborazione regione: {regione} ===")
-        print(f"> Base URL: {base_listing}")
-
-        # Definisci il file di output per la regione
-        output_csv = f"subito_cars_{regione}.csv"
-        processed_urls = set()
-        file_exists = os.path.isfile(output_csv)
-
-        # Se esiste già il file, carichiamo gli URL già processati
-        if file_exists:
-            with open(output_csv, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row.get("url"):
-                        processed_urls.add(row["url"])
-
-        # Apriamo il CSV in append o write, a seconda che esista o meno
-        mode = "a" if file_exists else "w"
-        csvfile = open(output_csv, mode, newline="", encoding="utf-8")
-        fieldnames = [
-            "url", "brand_model", "price", "year", "mileage",
-            "fuel_type", "transmission", "emission_standard",
-            "body_type", "description"
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-            csvfile.flush()
-
-        # 1) Estrai fino a MAX_LINKS URL di dettaglio per questa regione
-        link_annunci = estrai_link_da_listings(base_listing, MAX_LINKS, MAX_PAGES)
-        print(f">> Totale link da processare per {regione}: {len(link_annunci)}\n")
-
-        # 2) Filtriamo i link già processati
-        da_processare = [url for url in link_annunci if url not in processed_urls]
-        print(f">> {len(da_processare)} nuovi annunci da parsare.\n")
-
-        # 3) Lanciamo un ThreadPoolExecutor per processare in parallelo
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_url = {
-                executor.submit(parse_dettaglio_auto, url): url
-                for url in da_processare
-            }
+        elabora_regione(regione, lock)
 
-            for future in as_completed(future_to_url):
-                url = future_to_url[future]
-                try:
-                    record = future.result()
-                except Exception as e:
-                    print(f"    Errore nel thread per {url}: {e}")
-                    continue
-
-                # Scriviamo il risultato nel CSV sotto lock
-                with lock:
-                    if record["url"] not in processed_urls:
-                        writer.writerow({k: record.get(k, "") for k in fieldnames})
-                        csvfile.flush()
-                        processed_urls.add(record["url"])
-                        print(f"    Salvato: {record['url']}")
+    print(Metrics.summary())
 
-        csvfile.close()
-        print(f">> Esportazione completata: {len(processed_urls)} annunci salvati in '{output_csv}'")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
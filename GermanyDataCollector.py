@@ -24,13 +24,13 @@ from pathlib import Path
 from typing import List, Tuple
 from urllib.parse import parse_qs, quote_plus, urlencode, urlparse, urlunparse
 
-import pandas as pd
-import undetected_chromedriver as uc
 from bs4 import BeautifulSoup as Soup
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium_stealth import stealth
+# pandas and the browser stack (undetected_chromedriver, selenium, selenium_stealth)
+# are imported inside the functions using them: ~1 s of start-up that parsing,
+# CrawlSites.py and carprice.py never need.
+
+import Metrics
+from InlineScoring import ScoringStage
 
 # ───────────────────── CONFIG ─────────────────────
 CSV_ZIPCODES = Path("postal-code-germany.csv")
@@ -41,6 +41,10 @@ ZIP_LIMIT: int | None = None   # limit after distance filtering (None = all)
 ROUND_COOR   = 5           # decimals to dedup identical coords
 MIN_DISTANCE_KM = 70     # keep next ZIP only if ≥ this distance from prev.
 HUMAN_MIN, HUMAN_MAX = 0.10, 0.20
+SCORE_MODEL_DIR: str | None = None   # compiled model dir → inline scoring (None = off)
+SCORED_CSV   = "AutoScout24_scored.csv"
+METRICS_PORT: int | None = 9109   # local Prometheus/JSON endpoint (None = off)
+DESCRIPTION_PARSER = "lxml"      # BeautifulSoup backend for the description HTML (see ParserBench.py)
 
 BASE_MASK = (
     "https://www.autoscout24.de/lst?sort=standard&desc=0"
@@ -49,8 +53,10 @@ BASE_MASK = (
 )
 # ─────────────────────────────────────────────────
 
-def human_delay(a: float = HUMAN_MIN, b: float = HUMAN_MAX) -> None:
-    time.sleep(random.uniform(a, b))
+def human_delay(a: float = HUMAN_MIN, b: float = HUMAN_MAX, stage: str = "scroll") -> None:
+    pause = random.uniform(a, b)
+    time.sleep(pause)
+    Metrics.observe("sleep_seconds", pause, stage=stage)
 
 # ────────── GEO HELPERS ──────────
 
@@ -66,6 +72,8 @@ def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
 # ────────── LOAD, DEDUP & DISTANCE FILTER ──────────
 
 def load_unique_zip_rows(csv_path: Path, limit: int | None = None) -> List[Tuple[str, float, float]]:
+    import pandas as pd
+
     df = pd.read_csv(csv_path, dtype={"code": str})
     df["code"] = df["code"].str.zfill(5)
     df["lat_r"] = df["lat"].round(ROUND_COOR)
@@ -88,6 +96,9 @@ def load_unique_zip_rows(csv_path: Path, limit: int | None = None) -> List[Tuple
 # ────────── SELENIUM SETUP ──────────
 
 def make_driver(headless: bool = True):
+    import undetected_chromedriver as uc
+    from selenium_stealth import stealth
+
     options = uc.ChromeOptions()
     if headless:
         options.add_argument("--headless=new")
@@ -104,6 +115,10 @@ def make_driver(headless: bool = True):
     return driver
 
 def click_if_visible(driver, xpath: str) -> None:
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     try:
         WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, xpath))).click()
     except Exception:
@@ -111,8 +126,14 @@ def click_if_visible(driver, xpath: str) -> None:
 
 # ────────── PAGE HELPERS ──────────
 
+HEADER = ["car_name", "price", "mileage_km", "fuel", "power_kw", "transmission",
+          "first_registration", "seller_type", "description", "url", "zip"]
+
 def collect_links_on_page(driver, url: str) -> set[str]:
-    driver.get(url)
+    from selenium.webdriver.common.by import By
+
+    with Metrics.timer("fetch_seconds", stage="listing"):
+        driver.get(url)
     if not collect_links_on_page.cookie_clicked:
         click_if_visible(driver, '//button[contains(.,"Alle akzeptieren") or contains(.,"Alles akzeptieren")]')
         collect_links_on_page.cookie_clicked = True
@@ -138,29 +159,47 @@ def collect_links_on_page(driver, url: str) -> set[str]:
 collect_links_on_page.cookie_clicked = False
 
 
+def parse_listing_details(page: str, url: str, parser: str = DESCRIPTION_PARSER) -> List | None:
+    """Pure parse of a detail page source into a CSV row; None without __NEXT_DATA__."""
+    m = re.search(r'<script[^>]+id="__NEXT_DATA__"[^>]*>(.*?)</script>', page)
+    if not m:
+        return None
+    listing = json.loads(m.group(1))["props"]["pageProps"]["listingDetails"]
+    v, p = listing.get("vehicle", {}), listing.get("price", {})
+    return [
+        " ".join(filter(None, (v.get("make", ""), v.get("model", ""), v.get("modelVersionInput", "")))),
+        p.get("priceFormatted", ""),
+        v.get("mileageInKmRaw", ""),
+        v.get("fuelCategory", {}).get("formatted", ""),
+        v.get("powerInKw", ""),
+        v.get("rawData", {}).get("engine", {}).get("transmissionType", {}).get("formatted", ""),
+        v.get("firstRegistrationDate", ""),
+        listing.get("seller", {}).get("type", ""),
+        Soup((listing.get("description") or ""), parser).get_text(" ", strip=True),
+        url,
+        listing.get("location", {}).get("zip", ""),
+    ]
+
 def extract_details(driver, url: str):
     """Return a CSV row list or None; never raises."""
     try:
-        driver.get(url)
-        human_delay(0.45, 0.90)
-        m = re.search(r'<script[^>]+id="__NEXT_DATA__"[^>]*>(.*?)</script>', driver.page_source)
-        if not m:
+        with Metrics.timer("fetch_seconds", stage="detail"):
+            driver.get(url)
+        human_delay(0.45, 0.90, stage="detail")
+        page = driver.page_source
+        Metrics.observe("response_bytes", len(page), stage="detail")
+        t0 = time.perf_counter()
+        row = parse_listing_details(page, url)
+        if row is None:
+            Metrics.inc("pages", stage="detail", outcome="no_next_data")
             return None
-        listing = json.loads(m.group(1))["props"]["pageProps"]["listingDetails"]
-        v, p = listing.get("vehicle", {}), listing.get("price", {})
-        return [
-            " ".join(filter(None, (v.get("make", ""), v.get("model", ""), v.get("modelVersionInput", "")))),
-            p.get("priceFormatted", ""),
-            v.get("mileageInKmRaw", ""),
-            v.get("fuelCategory", {}).get("formatted", ""),
-            v.get("powerInKw", ""),
-            v.get("rawData", {}).get("engine", {}).get("transmissionType", {}).get("formatted", ""),
-            v.get("firstRegistrationDate", ""),
-            listing.get("seller", {}).get("type", ""),
-            Soup((listing.get("description") or ""), "lxml").get_text(" ", strip=True),
-            url,
-        ]
+        Metrics.observe("parse_seconds", time.perf_counter() - t0, stage="detail")
+        Metrics.inc("pages", stage="detail", outcome="ok")
+        for field, value in zip(HEADER, row):
+            Metrics.inc("fields_extracted" if value not in ("", None) else "fields_missing", field=field)
+        return row
     except Exception as e:
+        Metrics.inc("pages", stage="detail", outcome="error")
         print(f"   ⚠️  skipped {url} — {e}")
         return None
 
@@ -181,9 +220,15 @@ def main():
     zips = zips[START_FROM_IDX - 1:]
     print(f"   {len(zips):,} coordinates left after filtering")
 
+    Metrics.serve(METRICS_PORT)
     driver = make_driver(HEADLESS)
-    header = ["car_name", "price", "mileage_km", "fuel", "power_kw", "transmission",
-              "first_registration", "seller_type", "description", "url"]
+    header = HEADER
+
+    scorer = ScoringStage(SCORE_MODEL_DIR, SCORED_CSV).start() if SCORE_MODEL_DIR else None
+    if scorer:
+        Metrics.gauge("queue_depth", scorer.queue.qsize, queue="scoring")
+    pending = {"detail": 0}
+    Metrics.gauge("queue_depth", lambda: pending["detail"], queue="detail")
 
     with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
@@ -194,7 +239,7 @@ def main():
             print(f"\n🔍  [{idx}/{len(zips)}] ZIP {zip_code}  lat={lat} lon={lon}  url={base_first}")
 
             zip_links = collect_links_on_page(driver, base_first)
-            human_delay(0.6, 1.1)
+            human_delay(0.6, 1.1, stage="listing")
 
             parsed = urlparse(driver.current_url)
             qs = parse_qs(parsed.query)
@@ -210,19 +255,27 @@ def main():
                     break
                 zip_links.update(new)
                 print(f"   +{len(new):4} (zip total {len(zip_links)})")
-                human_delay(0.7, 1.3)
+                human_delay(0.7, 1.3, stage="listing")
 
             for n, url in enumerate(zip_links, 1):
+                pending["detail"] = len(zip_links) - n + 1
                 row = extract_details(driver, url)
                 if row:
-                    writer.writerow(row)
-                    f.flush(); os.fsync(f.fileno())
+                    with Metrics.timer("write_seconds", stage="detail"):
+                        writer.writerow(row)
+                        f.flush(); os.fsync(f.fileno())
+                    Metrics.inc("rows_written", site="autoscout")
                     print(f"✓ {n:>5}/{len(zip_links)}  {row[0][:55]}")
-                human_delay(0.2, 0.4)
+                    if scorer:
+                        scorer.submit(dict(zip(header, row)))
+                human_delay(0.2, 0.4, stage="detail")
             f.flush()
             print(f"   ZIP {zip_code} done → {len(zip_links)} listings written")
 
+    if scorer:
+        scorer.close()
     driver.quit()
+    print(Metrics.summary())
     print(f"🎉 Completed — data saved to {OUTPUT_CSV}")
 
 
@@ -0,0 +1,155 @@
+"""
+Inline price scoring – score-as-you-scrape
+==========================================
+Optional pipeline stage for DataCollector.py and GermanyDataCollector.py.
+Freshly parsed rows are handed to ``ScoringStage.submit`` which only does a
+non-blocking ``put`` on a bounded queue; a dedicated thread normalises them,
+scores them in small batches with the compiled model (CompiledModel.py) and
+appends ``predicted_price`` / ``residual`` next to the scraped price.
+
+The fetch workers never wait on scoring: when the queue is full the row is
+dropped from scoring (it is still in the raw CSV) and counted in ``dropped``.
+Listings priced below ``UNDERPRICED_RATIO`` × prediction are flagged and
+printed as soon as their batch is scored.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from Normalize import normalize_row
+
+# ───────────────────── CONFIG ─────────────────────
+BATCH_SIZE = 32            # rows per model call
+MAX_WAIT_S = 0.5           # flush a partial batch after this long
+QUEUE_SIZE = 2000          # bounded hand-off between crawl and scoring
+UNDERPRICED_RATIO = 0.80   # price < ratio × predicted → flagged
+# ─────────────────────────────────────────────────
+
+SCORED_FIELDS = [
+    "url", "ad_id", "make", "model", "year", "mileage_km", "fuel",
+    "region", "price", "predicted_price", "residual", "underpriced",
+]
+
+_STOP = object()
+
+
+class ScoringStage:
+    """Background thread that scores scraped rows and appends them to ``output_csv``."""
+
+    def __init__(self, model_dir, output_csv: str, region: Optional[str] = None,
+                 normalize: Callable[[dict, Optional[str]], dict] = normalize_row,
+                 batch_size: int = BATCH_SIZE, max_wait: float = MAX_WAIT_S,
+                 queue_size: int = QUEUE_SIZE, underpriced_ratio: float = UNDERPRICED_RATIO):
+        self.model_dir = model_dir
+        self.output_csv = output_csv
+        self.region = region
+        self.normalize = normalize
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.underpriced_ratio = underpriced_ratio
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.scored = 0
+        self.flagged = 0
+        self.dropped = 0
+        self.model = None
+        self._thread = threading.Thread(target=self._run, name="scoring", daemon=True)
+
+    def start(self) -> "ScoringStage":
+        """Load the model in the caller's thread (a bad ``model_dir`` raises here) and start scoring."""
+        # Imported here so the numpy import never delays collector start-up
+        import CompiledModel
+
+        self.model = CompiledModel.load(self.model_dir)
+        self._thread.start()
+        return self
+
+    def submit(self, row: dict) -> bool:
+        """Queue a raw collector row for scoring; never blocks the caller."""
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush pending rows and stop the scoring thread (never blocks on a dead one)."""
+        if self._thread.ident is None:      # start() never ran or raised
+            return
+        while self._thread.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self._thread.join(timeout)
+        print(f"   scoring: {self.scored} scored, {self.flagged} underpriced, "
+              f"{self.dropped} dropped (queue full) → {self.output_csv}")
+
+    def __enter__(self) -> "ScoringStage":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ────────── worker thread ──────────
+
+    def _next_batch(self) -> tuple[List[dict], bool]:
+        batch: List[dict] = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait
+        return batch, False
+
+    def _run(self) -> None:
+        try:
+            self._score_loop()
+        except Exception as e:
+            print(f"   ⚠️  scoring stopped — {e}")
+
+    def _score_loop(self) -> None:
+        import CompiledModel
+
+        file_exists = os.path.isfile(self.output_csv)
+        with open(self.output_csv, "a" if file_exists else "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=SCORED_FIELDS, extrasaction="ignore")
+            if not file_exists:
+                writer.writeheader()
+            stop = False
+            while not stop:
+                batch, stop = self._next_batch()
+                if not batch:
+                    continue
+                try:
+                    records = [self.normalize(row, self.region) for row in batch]
+                    scored = CompiledModel.score_records(self.model, records)
+                except Exception as e:
+                    print(f"   ⚠️  scoring batch failed — {e}")
+                    continue
+                for rec in scored:
+                    rec["underpriced"] = int(
+                        rec["price"] is not None
+                        and rec["price"] < self.underpriced_ratio * rec["predicted_price"]
+                    )
+                    writer.writerow(rec)
+                    if rec["underpriced"]:
+                        self.flagged += 1
+                        print(f"   💰 underpriced: {rec['price']:.0f} € vs "
+                              f"{rec['predicted_price']:.0f} € predicted  {rec['url']}")
+                f.flush()
+                self.scored += len(scored)
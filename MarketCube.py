@@ -0,0 +1,315 @@
+"""
+Market aggregate cube – mergeable price quantiles
+=================================================
+Precomputed price distribution per (make, model, year bucket, fuel, region)
+so analysts and the price model can ask for medians / quantiles of any slice
+without scanning the collector CSVs again.
+
+• **Sketch:** each cell holds a log-bucketed histogram with relative accuracy
+  ``ALPHA`` (DDSketch-style): a price p lands in bucket ⌈log_γ p⌉ with
+  γ = (1+α)/(1−α), so every reported quantile is within ±α of a true
+  sample value.  Histograms merge by adding counts – any slice is just the
+  sum of its cells.
+• **Layout:** cells are stored column-wise (one code array per dimension)
+  with the histograms in CSR form (``entry_cell``, ``entry_bucket``,
+  ``entry_count``).  A slice query is a boolean mask over cells plus one
+  ``np.bincount`` – a few milliseconds over the whole market.
+• **Incremental refresh:** the cube remembers how many bytes of each input
+  CSV it has folded in, so ``refresh`` parses just the appended rows and
+  merges them into the existing cells.  Every histogram entry is tagged
+  with the input file it came from (``entry_file``), so a file that shrank,
+  was replaced (new inode) or was rewritten (its first ``FINGERPRINT_BYTES``
+  changed – GermanyDataCollector.py reopens its CSV with "w") has its old
+  contribution dropped and is read again from the start.
+
+Regions are the Subito region of the file (subito_cars_<regione>.csv) and,
+for AutoScout rows, the federal_state of the listing ZIP from
+postal-code-germany.csv.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from Normalize import COLLECTOR_CSVS, normalize_row, region_from_path
+
+# ───────────────────── CONFIG ─────────────────────
+CUBE_DIR     = Path("market_cube")
+INPUT_FILES  = COLLECTOR_CSVS
+DIMENSIONS   = ["make", "model", "year_bucket", "fuel", "region"]
+YEAR_BUCKET  = 3           # years per bucket (2015 → 2013, …)
+ALPHA        = 0.01        # relative accuracy of reported quantiles
+PRICE_MIN, PRICE_MAX = 100.0, 2_000_000.0   # prices outside are clipped
+MIN_COUNT    = 20          # baseline(): smallest slice trusted as a baseline
+QUANTILES    = (0.10, 0.25, 0.50, 0.75, 0.90)
+FINGERPRINT_BYTES = 4096   # file prefix hashed to notice a rewritten input CSV
+# ─────────────────────────────────────────────────
+
+_GAMMA = (1 + ALPHA) / (1 - ALPHA)
+_LOG_GAMMA = math.log(_GAMMA)
+_B_MIN = math.ceil(math.log(PRICE_MIN) / _LOG_GAMMA)
+_B_MAX = math.ceil(math.log(PRICE_MAX) / _LOG_GAMMA)
+N_BUCKETS = _B_MAX - _B_MIN + 1
+# representative value of every bucket (relative error ≤ ALPHA)
+BUCKET_VALUES = 2 * _GAMMA ** np.arange(_B_MIN, _B_MAX + 1) / (_GAMMA + 1)
+
+# Most specific → least specific slices tried by baseline()
+BACKOFF = [
+    ("make", "model", "year_bucket", "fuel", "region"),
+    ("make", "model", "year_bucket", "fuel"),
+    ("make", "model", "year_bucket"),
+    ("make", "model"),
+    ("make",),
+]
+
+
+def price_bucket(price: float) -> int:
+    p = min(max(price, PRICE_MIN), PRICE_MAX)
+    return min(max(math.ceil(math.log(p) / _LOG_GAMMA), _B_MIN), _B_MAX) - _B_MIN
+
+
+def year_bucket(year: Optional[int]) -> Optional[int]:
+    return None if year is None else year - year % YEAR_BUCKET
+
+
+def cell_of(rec: dict) -> tuple:
+    return (rec.get("make"), rec.get("model"), year_bucket(rec.get("year")),
+            rec.get("fuel"), rec.get("region"))
+
+
+class MarketCube:
+    """Column-stored cube of mergeable price sketches."""
+
+    def __init__(self):
+        self.vocab: Dict[str, list] = {d: [] for d in DIMENSIONS}
+        self._codes: Dict[str, dict] = {d: {} for d in DIMENSIONS}
+        self.cell_codes = np.zeros((0, len(DIMENSIONS)), dtype=np.int32)
+        self.entry_cell = np.zeros(0, dtype=np.int32)
+        self.entry_bucket = np.zeros(0, dtype=np.int16)
+        self.entry_count = np.zeros(0, dtype=np.int64)
+        self.entry_file = np.zeros(0, dtype=np.int16)     # index into self.files
+        self.files: List[Optional[str]] = []
+        # input CSV → {"offset": bytes folded in, "inode", "head": prefix hash, "head_len"}
+        self.offsets: Dict[str, dict] = {}
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.cell_codes)
+
+    def _file_id(self, path: Optional[str]) -> int:
+        if path not in self.files:
+            self.files.append(path)
+        return self.files.index(path)
+
+    def _code(self, dim: str, value) -> int:
+        codes = self._codes[dim]
+        if value not in codes:
+            codes[value] = len(self.vocab[dim])
+            self.vocab[dim].append(value)
+        return codes[value]
+
+    # ────────── building / merging ──────────
+
+    def add(self, records: Iterable[dict], path: Optional[str] = None) -> int:
+        """Fold normalised records with a price into the cube; returns how many were added.
+
+        ``path`` is the input file the records come from, so that ``drop`` can
+        take its contribution out again.
+        """
+        cell_index = {tuple(row): i for i, row in enumerate(self.cell_codes.tolist())}
+        new_cells: List[tuple] = []
+        cells, buckets = [], []
+        for rec in records:
+            if not rec.get("price"):
+                continue
+            codes = tuple(self._code(d, v) for d, v in zip(DIMENSIONS, cell_of(rec)))
+            i = cell_index.get(codes)
+            if i is None:
+                i = cell_index[codes] = self.n_cells + len(new_cells)
+                new_cells.append(codes)
+            cells.append(i)
+            buckets.append(price_bucket(rec["price"]))
+        if not cells:
+            return 0
+        if new_cells:
+            self.cell_codes = np.vstack([self.cell_codes, np.asarray(new_cells, dtype=np.int32)])
+        # merge = concatenate entries and sum duplicates (file, cell, bucket)
+        file = np.concatenate([self.entry_file,
+                               np.full(len(cells), self._file_id(path), dtype=np.int16)])
+        cell = np.concatenate([self.entry_cell, np.asarray(cells, dtype=np.int32)])
+        bucket = np.concatenate([self.entry_bucket, np.asarray(buckets, dtype=np.int16)])
+        count = np.concatenate([self.entry_count, np.ones(len(cells), dtype=np.int64)])
+        key = (file.astype(np.int64) * self.n_cells + cell) * N_BUCKETS + bucket
+        uniq, inverse = np.unique(key, return_inverse=True)
+        self.entry_count = np.bincount(inverse, weights=count).astype(np.int64)
+        self.entry_bucket = (uniq % N_BUCKETS).astype(np.int16)
+        self.entry_cell = (uniq // N_BUCKETS % self.n_cells).astype(np.int32)
+        self.entry_file = (uniq // N_BUCKETS // self.n_cells).astype(np.int16)
+        return len(cells)
+
+    def drop(self, path: Optional[str]) -> int:
+        """Take every listing folded in from ``path`` out of the cube; returns how many."""
+        if path not in self.files:
+            return 0
+        mine = self.entry_file == self.files.index(path)
+        removed = int(self.entry_count[mine].sum())
+        keep = ~mine
+        for name in ("entry_file", "entry_cell", "entry_bucket", "entry_count"):
+            setattr(self, name, getattr(self, name)[keep])
+        self.offsets.pop(path, None)
+        return removed
+
+    @staticmethod
+    def _head(f, n: int) -> str:
+        f.seek(0)
+        return hashlib.blake2b(f.read(n), digest_size=8).hexdigest()
+
+    def _resume_offset(self, path: str, f, size: int, inode: int) -> int:
+        """Bytes of ``path`` already folded in; 0 when the file is not the one seen last time.
+
+        A rewritten file has its earlier contribution dropped before it is read again.
+        """
+        seen = self.offsets.get(path)
+        if not seen:
+            return 0
+        if (size < seen["offset"] or seen["inode"] != inode
+                or self._head(f, seen["head_len"]) != seen["head"]):
+            removed = self.drop(path)
+            print(f"   🔄 {path} was rewritten since the last refresh – dropped its "
+                  f"{removed:,} listings, re-reading it from the start")
+            return 0
+        return seen["offset"]
+
+    def refresh(self, paths: Sequence[str] = INPUT_FILES) -> int:
+        """Fold in only the rows appended to each CSV since the last refresh."""
+        added = 0
+        for path in paths:
+            if not Path(path).is_file():
+                continue
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                resume = self._resume_offset(path, f, st.st_size, st.st_ino)
+                f.seek(0)
+                header = f.readline()
+                start = max(resume, len(header))
+                f.seek(start)
+                chunk = f.read()
+                end = chunk.rfind(b"\n") + 1     # only complete rows
+                if end <= 0:
+                    continue
+                head_len = min(FINGERPRINT_BYTES, start + end)
+                head = self._head(f, head_len)
+            text = header.decode("utf-8") + chunk[:end].decode("utf-8")
+            region = region_from_path(path)
+            added += self.add((normalize_row(r, region) for r in csv.DictReader(io.StringIO(text))),
+                              path)
+            self.offsets[path] = {"offset": start + end, "inode": st.st_ino,
+                                  "head": head, "head_len": head_len}
+        return added
+
+    # ────────── queries ──────────
+
+    def _mask(self, filters: dict) -> np.ndarray:
+        mask = np.ones(self.n_cells, dtype=bool)
+        for dim, want in filters.items():
+            if want is None:
+                continue
+            col = DIMENSIONS.index(dim)
+            vocab = self.vocab[dim]
+            if dim == "year_bucket" and isinstance(want, tuple):
+                lo, hi = want
+                ok = [i for i, v in enumerate(vocab) if v is not None and lo <= v <= hi]
+            else:
+                values = set(want) if isinstance(want, (list, set, frozenset)) else {want}
+                ok = [self._codes[dim][v] for v in values if v in self._codes[dim]]
+            mask &= np.isin(self.cell_codes[:, col], ok)
+        return mask
+
+    def histogram(self, **filters) -> np.ndarray:
+        """Merged price histogram of a slice, e.g. histogram(make="fiat", region="molise")."""
+        if "year" in filters:
+            year = filters.pop("year")
+            filters["year_bucket"] = (tuple(year_bucket(y) for y in year)
+                                      if isinstance(year, tuple) else year_bucket(year))
+        sel = self._mask(filters)[self.entry_cell]
+        return np.bincount(self.entry_bucket[sel], weights=self.entry_count[sel],
+                           minlength=N_BUCKETS)
+
+    def query(self, quantiles: Sequence[float] = QUANTILES, **filters) -> dict:
+        """Count, mean and quantiles of a slice.
+
+        Filters take a value, a list of values, or for ``year`` / ``year_bucket``
+        an inclusive (lo, hi) tuple; omitted dimensions are aggregated over.
+        """
+        hist = self.histogram(**filters)
+        n = int(hist.sum())
+        out = {"count": n}
+        if n == 0:
+            return out
+        cum = np.cumsum(hist)
+        out["mean"] = float((hist * BUCKET_VALUES).sum() / n)
+        for q in quantiles:
+            idx = int(np.searchsorted(cum, q * n, side="left"))
+            out[f"p{int(round(q * 100))}"] = float(BUCKET_VALUES[min(idx, N_BUCKETS - 1)])
+        return out
+
+    def baseline(self, rec: dict, min_count: int = MIN_COUNT) -> Optional[float]:
+        """Regional median for ``rec`` from the most specific slice with ≥ min_count listings."""
+        values = dict(zip(DIMENSIONS, cell_of(rec)))
+        for dims in BACKOFF:
+            if any(values[d] is None for d in dims):
+                continue
+            res = self.query((0.5,), **{d: values[d] for d in dims})
+            if res["count"] >= min_count:
+                return res["p50"]
+        return None
+
+    # ────────── persistence ──────────
+
+    def save(self, cube_dir: Path = CUBE_DIR) -> None:
+        cube_dir = Path(cube_dir)
+        cube_dir.mkdir(parents=True, exist_ok=True)
+        for name in ("cell_codes", "entry_cell", "entry_bucket", "entry_count", "entry_file"):
+            np.save(cube_dir / f"{name}.npy", getattr(self, name))
+        meta = {"dimensions": DIMENSIONS, "alpha": ALPHA, "year_bucket": YEAR_BUCKET,
+                "price_range": [PRICE_MIN, PRICE_MAX], "vocab": self.vocab,
+                "files": self.files, "offsets": self.offsets}
+        (cube_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def load(cls, cube_dir: Path = CUBE_DIR) -> "MarketCube":
+        """Load a saved cube; an empty cube if none exists yet."""
+        cube = cls()
+        cube_dir = Path(cube_dir)
+        if not (cube_dir / "meta.json").is_file():
+            return cube
+        meta = json.loads((cube_dir / "meta.json").read_text(encoding="utf-8"))
+        if meta["alpha"] != ALPHA or meta["year_bucket"] != YEAR_BUCKET:
+            raise ValueError(f"{cube_dir} was built with different ALPHA / YEAR_BUCKET – rebuild it")
+        if "files" not in meta:
+            raise ValueError(f"{cube_dir} predates per-file entries – rebuild it")
+        cube.vocab = meta["vocab"]
+        cube._codes = {d: {v: i for i, v in enumerate(vals)} for d, vals in cube.vocab.items()}
+        cube.files = meta["files"]
+        cube.offsets = meta["offsets"]
+        for name in ("cell_codes", "entry_cell", "entry_bucket", "entry_count", "entry_file"):
+            setattr(cube, name, np.load(cube_dir / f"{name}.npy"))
+        return cube
+
+# ────────── MAIN ──────────
+
+if __name__ == "__main__":
+    cube = MarketCube.load(CUBE_DIR)
+    added = cube.refresh(INPUT_FILES)
+    cube.save(CUBE_DIR)
+    print(f"🎉 +{added:,} listings folded in → {cube.n_cells:,} cells, "
+          f"{int(cube.entry_count.sum()):,} listings total in {CUBE_DIR}/")
@@ -0,0 +1,234 @@
+"""
+Crawl metrics – per-stage instrumentation for the collectors
+============================================================
+A tiny, dependency-free metrics registry used by DataCollector.py and
+GermanyDataCollector.py:
+
+• **counters**   – ``inc("http_responses", status="200")``
+• **histograms** – ``observe("fetch_seconds", 0.31, stage="detail")`` or
+  ``with timer("parse_seconds", stage="detail"): …`` (fixed buckets, so an
+  observation is one lock + a bisect: ~2 µs, noise next to any fetch)
+• **gauges**     – ``gauge("queue_depth", fn, queue="scoring")`` evaluated
+  lazily when the metrics are read
+
+``serve(port)`` exposes everything on 127.0.0.1 as Prometheus text
+(``/metrics``, with ``# TYPE`` lines) and JSON (``/metrics.json``); a port
+already in use only costs the endpoint, never the crawl.  ``summary()``
+renders the end-of-run table printed by the collectors.
+
+Keep label values low-cardinality (stage, site, region, status): every
+distinct value is a separate series kept for the whole run.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+# ───────────────────── CONFIG ─────────────────────
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+PREFIX = "carprice_"
+# ─────────────────────────────────────────────────
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: dict) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "total", "n")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.n += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile."""
+        target, cum = q * self.n, 0
+        for bound, c in zip(self.bounds + (float("inf"),), self.counts):
+            cum += c
+            if cum >= target:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[LabelKey, float] = {}
+        self.histograms: Dict[LabelKey, _Histogram] = {}
+        self.gauges: Dict[LabelKey, Callable[[], float]] = {}
+        self.started = time.time()
+
+    def reset(self) -> None:
+        """Drop every series (used between benchmark runs)."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.gauges.clear()
+            self.started = time.time()
+
+    def inc(self, name: str, n: float = 1, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                bounds = BYTES_BUCKETS if name.endswith("_bytes") else SECONDS_BUCKETS
+                hist = self.histograms[key] = _Histogram(bounds)
+            hist.observe(value)
+
+    def gauge(self, name: str, fn: Callable[[], float], **labels) -> None:
+        with self._lock:
+            self.gauges[_key(name, labels)] = fn
+
+    def remove_gauge(self, name: str, **labels) -> None:
+        with self._lock:
+            self.gauges.pop(_key(name, labels), None)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    # ────────── exposition ──────────
+
+    def _gauge_values(self) -> Dict[LabelKey, float]:
+        out = {}
+        for key, fn in list(self.gauges.items()):
+            try:
+                out[key] = float(fn())
+            except Exception:
+                pass
+        return out
+
+    def prometheus(self) -> str:
+        def fmt(name, labels, extra=()):
+            items = list(labels) + list(extra)
+            body = ",".join(f'{k}="{v}"' for k, v in items)
+            return f"{PREFIX}{name}{{{body}}}" if body else f"{PREFIX}{name}"
+
+        lines = []
+        typed = set()
+
+        def declare(family, kind):
+            # one "# TYPE" line per family, right before its first sample
+            if family not in typed:
+                typed.add(family)
+                lines.append(f"# TYPE {PREFIX}{family} {kind}")
+
+        with self._lock:
+            counters = dict(self.counters)
+            hists = {k: (h.bounds, list(h.counts), h.total, h.n) for k, h in self.histograms.items()}
+        for (name, labels), v in sorted(counters.items()):
+            declare(name + "_total", "counter")
+            lines.append(f"{fmt(name + '_total', labels)} {v:g}")
+        for (name, labels), v in sorted(self._gauge_values().items()):
+            declare(name, "gauge")
+            lines.append(f"{fmt(name, labels)} {v:g}")
+        for (name, labels), (bounds, counts, total, n) in sorted(hists.items()):
+            declare(name, "histogram")
+            cum = 0
+            for bound, c in zip(bounds + (float("inf"),), counts):
+                cum += c
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{fmt(name + '_bucket', labels, [('le', le)])} {cum}")
+            lines.append(f"{fmt(name + '_sum', labels)} {total:g}")
+            lines.append(f"{fmt(name + '_count', labels)} {n}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        def label_str(labels):
+            return ",".join(f"{k}={v}" for k, v in labels)
+
+        with self._lock:
+            counters = {f"{n}{{{label_str(l)}}}": v for (n, l), v in self.counters.items()}
+            hists = {
+                f"{n}{{{label_str(l)}}}": {
+                    "count": h.n, "sum": h.total,
+                    "mean": h.total / h.n if h.n else 0.0,
+                    "p50": h.quantile(0.5), "p95": h.quantile(0.95),
+                }
+                for (n, l), h in self.histograms.items()
+            }
+        gauges = {f"{n}{{{label_str(l)}}}": v for (n, l), v in self._gauge_values().items()}
+        return {"uptime_s": time.time() - self.started, "counters": counters,
+                "gauges": gauges, "histograms": hists}
+
+    def summary(self) -> str:
+        snap = self.snapshot()
+        out = [f"── run summary ({snap['uptime_s']:.0f}s) ──"]
+        for name, h in sorted(snap["histograms"].items()):
+            out.append(f"  {name:<48} n={h['count']:<7} total={h['sum']:<10.2f} "
+                       f"mean={h['mean']:.4f} p50≤{h['p50']:g} p95≤{h['p95']:g}")
+        for name, v in sorted(snap["counters"].items()):
+            out.append(f"  {name:<48} {v:g}")
+        return "\n".join(out)
+
+# ────────── DEFAULT REGISTRY & HTTP ENDPOINT ──────────
+
+METRICS = Registry()
+inc, observe, gauge, remove_gauge, timer = (
+    METRICS.inc, METRICS.observe, METRICS.gauge, METRICS.remove_gauge, METRICS.timer)
+
+
+def summary() -> str:
+    return METRICS.summary()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = METRICS
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, ctype = json.dumps(self.registry.snapshot()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, ctype = self.registry.prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: Optional[int], host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Start the metrics endpoint on a daemon thread (no-op when port is None,
+    or when the port cannot be bound – the crawl goes on without it)."""
+    if port is None:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        print(f"   ⚠️  metrics endpoint not started on {host}:{port} — {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"   metrics on http://{host}:{port}/metrics (and /metrics.json)")
+    return server
@@ -0,0 +1,515 @@
+"""
+Mock marketplace – offline crawl throughput benchmarks
+======================================================
+A local stand-in for subito.it and autoscout24.de so crawler throughput can be
+measured (and regression-tested) without touching the real sites.
+
+Routes served
+-------------
+• ``/annunci-<regione>/vendita/auto/?o=N``  Subito listing page – copy.html with
+  its ad links rewritten to mock ads (unique per region/page)
+• ``/auto/<slug>-<id>.htm``                 Subito detail page built from a row
+  of ``SUBITO_FIXTURE`` (h1 / price / "Dati principali" / description markup)
+• ``/lst?zip=…&page=N``                     AutoScout list page with
+  ``article[data-testid="list-item"]`` cards
+• ``/angebote/<slug>-<uuid>``               AutoScout detail page whose
+  ``__NEXT_DATA__`` listingDetails are built from ``AUTOSCOUT_FIXTURE``
+
+Fault injection: per-request latency (``LATENCY_MS``), bursts of 429/503
+(``BURST_PROB`` / ``BURST_LEN``) and a pagination limit (``MAX_LIST_PAGES``).
+
+Market drift: ``--epoch N`` replays N rounds of change on the Subito ads –
+each round cuts ``PRICE_DROP_PCT`` % of prices by 5 % (listing JSON and detail
+page agree) and removes ``GONE_PCT`` % of ads (410 + dropped from listings),
+so the incremental re-crawl of DataCollector.py can be exercised.
+
+Usage
+-----
+    python MockMarketplace.py serve [--port 8765] [--epoch 1]
+    python MockMarketplace.py bench [--site subito|autoscout|engine|all] [--json]
+
+``bench`` starts the server in a child process (so its CPU is not counted),
+points DataCollector.py / GermanyDataCollector.py at it with all politeness
+sleeps disabled, runs their real pipelines and reports pages/s, CPU per page
+and peak memory.  GermanyDataCollector is driven through ``HttpDriver``, a
+requests + BeautifulSoup stand-in for the Selenium driver – it measures the
+pipeline, not Chrome.  ``--site engine`` crawls both sites concurrently in one
+process through CrawlEngine.py (default browser budget).
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import random
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import Metrics
+
+# ───────────────────── CONFIG ─────────────────────
+HERE = Path(__file__).resolve().parent
+SUBITO_LISTING_TEMPLATE = HERE / "copy.html"
+SUBITO_FIXTURE   = HERE / "subito_cars_molise.csv"
+AUTOSCOUT_FIXTURE = HERE / "GermanyData.csv"
+PORT             = 8765
+LATENCY_MS       = (40.0, 15.0)   # mean, std-dev of per-request latency
+BURST_PROB       = 0.01           # chance a request starts an error burst
+BURST_LEN        = 5              # consecutive error responses per burst
+BURST_STATUSES   = (429, 503)
+MAX_LIST_PAGES   = 5              # listing pages per region / ZIP before results run dry
+AUTOSCOUT_PER_PAGE = 20
+PAGE_PADDING_KB  = 200            # filler markup so pages weigh like the real ones
+PRICE_DROP_PCT   = 5              # % of Subito ads whose price drops in each epoch
+GONE_PCT         = 2              # % of Subito ads removed in each epoch
+BENCH_REGIONS    = ["molise"]
+BENCH_ZIPS       = 2
+BENCH_WORKERS    = 20
+# ─────────────────────────────────────────────────
+
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+_SUBITO_LINK = re.compile(r"https://www\.subito\.it/auto/([a-z0-9\-]+?)-(\d+)\.htm")
+_NEXT_DATA = re.compile(r'(<script id="__NEXT_DATA__"[^>]*>)(.*?)</script>', re.S)
+_FEATURE_ICONS = [("register_date", "year"), ("mileage_scalar", "mileage"), ("fuel", "fuel_type"),
+                  ("gearbox", "transmission"), ("pollution", "emission_standard"),
+                  ("car_type", "body_type")]
+_INFOLIST_LABELS = [("Marca e modello", "brand_model"), ("Anno", "year"), ("Chilometraggio", "mileage"),
+                    ("Carburante", "fuel_type"), ("Cambio", "transmission"),
+                    ("Classe emissioni", "emission_standard"), ("Carrozzeria", "body_type")]
+
+
+def _padding() -> str:
+    block = ('<div class="Filler_card__x9"><span class="caption">Annuncio correlato</span>'
+             '<p class="body-text">Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p></div>')
+    return block * max(0, PAGE_PADDING_KB * 1024 // len(block))
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60] or "auto"
+
+# ────────── PAGE FACTORY ──────────
+
+class Pages:
+    """Builds every mock page from the fixtures (loaded once)."""
+
+    def __init__(self, base: str, epoch: int = 0):
+        self.base = base
+        self.epoch = epoch
+        self.listing_template = SUBITO_LISTING_TEMPLATE.read_text(encoding="utf-8")
+        self.listing_ids = list(dict.fromkeys(m.group(2) for m in _SUBITO_LINK.finditer(self.listing_template)))
+        with open(SUBITO_FIXTURE, newline="", encoding="utf-8") as f:
+            self.subito_rows = [r for r in csv.DictReader(f) if r.get("brand_model")]
+        with open(AUTOSCOUT_FIXTURE, newline="", encoding="utf-8") as f:
+            self.autoscout_rows = [r for r in csv.DictReader(f) if r.get("car_name")]
+        self.padding = _padding()
+
+    # Subito ----------------------------------------------------------------
+
+    def subito_listing(self, regione: str, page: int) -> str:
+        if page > MAX_LIST_PAGES:
+            return "<html><body><p>Nessun risultato</p></body></html>"
+        region_off = zlib.crc32(regione.encode()) % 1000 * 1_000_000
+        index = {old: region_off + page * 1000 + k for k, old in enumerate(self.listing_ids)}
+
+        def relink(m):
+            new_id = index[m.group(2)]
+            if self.subito_gone(new_id):
+                return f"{self.base}/venduto/{new_id}"
+            row = self.subito_rows[new_id % len(self.subito_rows)]
+            return f"{self.base}/auto/{_slug(row['brand_model'])}-{new_id}.htm"
+        html = _SUBITO_LINK.sub(relink, self.listing_template)
+
+        # keep the listing snapshot prices in step with the detail pages
+        def reprice(m):
+            data = json.loads(m.group(2))
+            for entry in data["props"]["pageProps"]["initialState"]["items"]["list"]:
+                ad = re.search(r"-(\d+)\.htm$", entry["item"]["urls"]["default"])
+                if ad:
+                    price = self.subito_price(int(ad.group(1)))
+                    entry["item"]["features"]["/price"] = {"values": [
+                        {"key": re.sub(r"\D", "", price), "value": price}]}
+            body = json.dumps(data, ensure_ascii=False).replace("</", "<\\/")
+            return f"{m.group(1)}{body}</script>"
+        return _NEXT_DATA.sub(reprice, html, count=1)
+
+    def subito_price(self, ad_id: int) -> str:
+        """Fixture price, cut by 5 % in every epoch that picks the ad for a drop."""
+        price = self.subito_rows[ad_id % len(self.subito_rows)].get("price") or ""
+        digits = re.sub(r"\D", "", price.split(",")[0])
+        drops = sum(zlib.crc32(f"drop:{ad_id}:{e}".encode()) % 100 < PRICE_DROP_PCT
+                    for e in range(1, self.epoch + 1))
+        if not drops or not digits:
+            return price
+        return f"{round(int(digits) * 0.95 ** drops):,} €".replace(",", ".")
+
+    def subito_gone(self, ad_id: int) -> bool:
+        return any(zlib.crc32(f"gone:{ad_id}:{e}".encode()) % 100 < GONE_PCT
+                   for e in range(1, self.epoch + 1))
+
+    def subito_detail(self, ad_id: int, url: str) -> str:
+        row = self.subito_rows[ad_id % len(self.subito_rows)]
+        price = self.subito_price(ad_id)
+        features = "".join(
+            f'<div class="main-data_main-feature__Qx7Gh"><img src="https://assets.subito.it/static/'
+            f'icons/cactus/{icon}.svg" alt=""/><p class="body-text">{escape(row.get(col) or "")}</p></div>'
+            for icon, col in _FEATURE_ICONS if row.get(col)
+        )
+        next_data = json.dumps({"props": {"pageProps": {"initialState": {"detail": {"item": {
+            "subject": row["brand_model"], "body": row.get("description") or "",
+            "urls": {"default": url},
+            "features": {
+                "/price": {"values": [{"key": re.sub(r"\D", "", price), "value": price}]},
+                **{f"/{icon}": {"values": [{"value": row.get(col) or ""}]}
+                   for icon, col in _FEATURE_ICONS if row.get(col)},
+            },
+        }}}}}}, ensure_ascii=False).replace("</", "<\\/")
+        return (
+            '<!DOCTYPE html><html lang="it"><head><meta charset="utf-8"/>'
+            f'<title>{escape(row["brand_model"])} | Subito</title>'
+            f'<link rel="canonical" href="{url}"/></head><body><main class="AdPage_main__k2Lb1">'
+            f'<div class="AdInfo_ad-info__uH2xz"><h1 class="headline-5 AdInfo_title__7bY3n">'
+            f'{escape(row["brand_model"])}</h1>'
+            f'<p class="headline-6 AdInfo_price__flXgp">{escape(price)}</p></div>'
+            '<section><h6 class="headline-6">Dati principali</h6>'
+            f'<div class="main-data_main-features-container__P3vJk">{features}</div></section>'
+            '<section><p class="body-text AdDescription_description__gUbvH">'
+            f'{escape(row.get("description") or "")}</p></section>'
+            f'{self.padding}</main>'
+            f'<script id="__NEXT_DATA__" type="application/json">{next_data}</script>'
+            '</body></html>'
+        )
+
+    def subito_detail_legacy(self, ad_id: int, url: str) -> str:
+        """Older detail layout with the ``<li><span>Label:</span> value</li>`` infoList
+        read by ParserSubito.py / Subito100.py (not served; used by ParserBench.py)."""
+        row = self.subito_rows[ad_id % len(self.subito_rows)]
+        items = "".join(
+            f'<li><span class="adDescriptionSection__label">{label}:</span> {escape(row[col])}</li>'
+            for label, col in _INFOLIST_LABELS if row.get(col)
+        )
+        return (
+            '<!DOCTYPE html><html lang="it"><head><meta charset="utf-8"/>'
+            f'<link rel="canonical" href="{url}"/></head><body><div class="adDescriptionSection">'
+            f'<h1>{escape(row["brand_model"])}</h1>'
+            f'<div class="adDescriptionSection__infoList"><ul>{items}</ul></div>'
+            f'<p>{escape(row.get("description") or "")}</p></div>{self.padding}</body></html>'
+        )
+
+    # AutoScout -------------------------------------------------------------
+
+    def autoscout_list(self, zip_code: str, page: int) -> str:
+        if page > MAX_LIST_PAGES:
+            cards = ""
+        else:
+            ids = [self._uuid(zip_code, page, n) for n in range(AUTOSCOUT_PER_PAGE)]
+            cards = "".join(
+                f'<article data-testid="list-item" class="cldt-summary-full-item">'
+                f'<a href="{self.base}/angebote/{_slug(self._autoscout_row(i)["car_name"])}-{i}">'
+                f'<h2>{escape(self._autoscout_row(i)["car_name"])}</h2></a></article>'
+                for i in ids
+            )
+        return (f'<html lang="de"><body><main class="ListPage_main__L0gsf">{cards}</main>{self.padding}'
+                '<script id="__NEXT_DATA__" type="application/json">{"props": {"pageProps": {}}}</script>'
+                '</body></html>')
+
+    def _uuid(self, zip_code: str, page: int, n: int) -> str:
+        return str(uuid.UUID(int=(zlib.crc32(zip_code.encode()) << 64) | (page << 16) | n))
+
+    def _autoscout_row(self, ad_uuid: str) -> dict:
+        return self.autoscout_rows[uuid.UUID(ad_uuid).int % len(self.autoscout_rows)]
+
+    def autoscout_detail(self, ad_uuid: str, url: str) -> str:
+        row = self._autoscout_row(ad_uuid)
+        words = row["car_name"].split()
+        listing = {
+            "vehicle": {
+                "make": words[0] if words else "", "model": words[1] if len(words) > 1 else "",
+                "modelVersionInput": " ".join(words[2:]),
+                "mileageInKmRaw": row.get("mileage_km") or "",
+                "fuelCategory": {"formatted": row.get("fuel") or ""},
+                "powerInKw": row.get("power_kw") or "",
+                "rawData": {"engine": {"transmissionType": {"formatted": row.get("transmission") or ""}}},
+                "firstRegistrationDate": row.get("first_registration") or "",
+            },
+            "price": {"priceFormatted": row.get("price") or ""},
+            "seller": {"type": row.get("seller_type") or "Dealer"},
+            "description": f"<p>{escape(row.get('description') or '')}</p>",
+            "location": {"zip": row.get("zip") or "10115"},
+        }
+        next_data = json.dumps({"props": {"pageProps": {"listingDetails": listing}}},
+                               ensure_ascii=False).replace("</", "<\\/")
+        return (f'<html lang="de"><head><link rel="canonical" href="{url}"/></head><body>'
+                f'<main>{escape(row["car_name"])}</main>{self.padding}'
+                f'<script id="__NEXT_DATA__" type="application/json">{next_data}</script></body></html>')
+
+# ────────── HTTP SERVER ──────────
+
+class _Faults:
+    def __init__(self, seed: int = 0):
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.burst_left = 0
+        self.burst_status = 429
+
+    def next_status(self) -> Optional[int]:
+        with self.lock:
+            if self.burst_left == 0 and self.rng.random() < BURST_PROB:
+                self.burst_left = BURST_LEN
+                self.burst_status = self.rng.choice(BURST_STATUSES)
+            if self.burst_left:
+                self.burst_left -= 1
+                return self.burst_status
+            return None
+
+    def delay(self) -> float:
+        with self.lock:
+            return max(0.0, self.rng.gauss(*LATENCY_MS)) / 1000
+
+
+def make_server(port: int = PORT, host: str = "127.0.0.1", epoch: int = 0) -> ThreadingHTTPServer:
+    base = f"http://{host}:{port}"
+    pages = Pages(base, epoch)
+    faults = _Faults()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(faults.delay())
+            status = faults.next_status()
+            if status:
+                self._send(status, f"<html><body>{status}</body></html>", {"Retry-After": "1"})
+                return
+            url = urlparse(self.path)
+            qs = parse_qs(url.query)
+            page = int((qs.get("o") or qs.get("page") or ["1"])[0])
+            m_list = re.fullmatch(r"/annunci-([a-z\-]+)/vendita/auto/", url.path)
+            m_detail = re.fullmatch(r"/auto/[a-z0-9\-]*?-(\d+)\.htm", url.path)
+            m_as_detail = re.fullmatch(r"/angebote/.*-([0-9a-f\-]{36})", url.path)
+            if m_list:
+                body = pages.subito_listing(m_list.group(1), page)
+            elif m_detail and pages.subito_gone(int(m_detail.group(1))):
+                self._send(410, "<html><body>Annuncio non più disponibile</body></html>")
+                return
+            elif m_detail:
+                body = pages.subito_detail(int(m_detail.group(1)), base + url.path)
+            elif url.path == "/lst":
+                body = pages.autoscout_list((qs.get("zip") or ["00000"])[0], page)
+            elif m_as_detail:
+                body = pages.autoscout_detail(m_as_detail.group(1), base + url.path)
+            else:
+                self._send(404, "<html><body>404</body></html>")
+                return
+            self._send(200, body)
+
+        def _send(self, status: int, body: str, headers: Optional[dict] = None):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def _serve_forever(port: int, ready, epoch: int = 0) -> None:
+    server = make_server(port, epoch=epoch)
+    ready.set()
+    server.serve_forever()
+
+
+@contextlib.contextmanager
+def running_server(port: int = PORT, epoch: int = 0):
+    """Run the mock server in a child process for the duration of the block."""
+    ready = multiprocessing.Event()
+    proc = multiprocessing.Process(target=_serve_forever, args=(port, ready, epoch), daemon=True)
+    proc.start()
+    ready.wait(30)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.join()
+
+# ────────── SELENIUM STAND-IN ──────────
+
+class _Element:
+    def __init__(self, tag):
+        self.tag = tag
+
+    def find_element(self, by, selector):
+        found = self.tag.select_one(selector)
+        if found is None:
+            raise LookupError(selector)
+        return _Element(found)
+
+    def get_attribute(self, name):
+        return self.tag.get(name)
+
+
+class HttpDriver:
+    """The slice of the Selenium WebDriver API that GermanyDataCollector uses."""
+
+    def __init__(self):
+        import requests
+        self.session = requests.Session()
+        self.current_url = ""
+        self.page_source = ""
+        self._soup = None
+
+    def get(self, url: str) -> None:
+        resp = self.session.get(url, timeout=30)
+        Metrics.inc("http_responses", stage="driver", status=resp.status_code)
+        self.current_url, self.page_source, self._soup = resp.url, resp.text, None
+
+    def find_elements(self, by, selector: str) -> List[_Element]:
+        from bs4 import BeautifulSoup
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.page_source, "html.parser")
+        return [_Element(t) for t in self._soup.select(selector)]
+
+    def find_element(self, by, selector: str) -> _Element:
+        raise LookupError(selector)
+
+    def execute_script(self, *args):
+        return None
+
+    def quit(self) -> None:
+        self.session.close()
+
+# ────────── BENCHMARK ──────────
+
+def _pages_fetched() -> int:
+    return sum(h.n for (name, _), h in Metrics.METRICS.histograms.items() if name == "fetch_seconds")
+
+
+def _measure(label: str, run) -> dict:
+    Metrics.METRICS.reset()
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = run()
+    wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    pages = _pages_fetched()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "site": label, "pages": pages, "rows": rows, "wall_s": round(wall, 2),
+        "pages_per_s": round(pages / wall, 1) if wall else 0.0,
+        "cpu_ms_per_page": round(1000 * cpu / pages, 2) if pages else 0.0,
+        "peak_rss_mb": round(rss / 1024, 1), "rss_growth_mb": round((rss - rss0) / 1024, 1),
+        "errors": int(sum(v for (name, labels), v in Metrics.METRICS.counters.items()
+                          if name == "http_responses" and dict(labels)["status"] != "200")),
+    }
+
+
+def bench_subito(base: str, workdir: Path) -> dict:
+    import DataCollector as dc
+    dc.SUBITO_BASE, dc.LISTING_DELAY, dc.METRICS_PORT = base, 0.0, None
+    dc.SCORE_MODEL_DIR, dc.MAX_WORKERS = None, BENCH_WORKERS
+    dc.PRICE_HISTORY = str(workdir / "price_history.bin")
+    lock = threading.Lock()
+
+    def run():
+        return sum(dc.elabora_regione(r, lock, str(workdir / f"subito_cars_{r}.csv")) for r in BENCH_REGIONS)
+    return _measure("subito", run)
+
+
+def bench_autoscout(base: str, workdir: Path) -> dict:
+    import GermanyDataCollector as gc
+    gc.make_driver = lambda headless=True: HttpDriver()
+    gc.human_delay = lambda *a, **k: None
+    gc.collect_links_on_page.cookie_clicked = True
+    gc.BASE_MASK = base + "/lst?sort=standard&lat={lat}&lon={lon}&zip={zip}&zipr=100"
+    gc.CSV_ZIPCODES = HERE / "postal-code-germany.csv"
+    gc.ZIP_LIMIT, gc.START_FROM_IDX, gc.MAX_PAGES = BENCH_ZIPS, 1, MAX_LIST_PAGES + 1
+    gc.OUTPUT_CSV, gc.METRICS_PORT, gc.SCORE_MODEL_DIR = str(workdir / "AutoScout24_ZIP.csv"), None, None
+
+    def run():
+        gc.main()
+        with open(gc.OUTPUT_CSV, newline="", encoding="utf-8") as f:
+            return sum(1 for _ in csv.DictReader(f))
+    return _measure("autoscout24", run)
+
+
+def bench_engine(base: str, workdir: Path) -> dict:
+    """Both sites at once through CrawlEngine, same regions / ZIPs as the per-site runs."""
+    workdir = workdir / "engine"
+    workdir.mkdir(exist_ok=True)
+    import CrawlEngine
+    import GermanyDataCollector as gc
+    from CrawlSites import AutoScoutSite, SubitoSite
+    gc.HUMAN_MIN = gc.HUMAN_MAX = 0.0
+    CrawlEngine.FSYNC, CrawlEngine.SCORE_MODEL_DIR, CrawlEngine.PRICE_HISTORY = True, None, None
+    zips = gc.load_unique_zip_rows(HERE / "postal-code-germany.csv", BENCH_ZIPS)
+    subito = SubitoSite(BENCH_REGIONS, base=base, max_pages=MAX_LIST_PAGES + 1, output_dir=str(workdir))
+    autoscout = AutoScoutSite(zips, base_mask=base + "/lst?sort=standard&lat={lat}&lon={lon}&zip={zip}&zipr=100",
+                              max_pages=MAX_LIST_PAGES + 1, output=str(workdir / "AutoScout24_engine.csv"),
+                              driver_factory=HttpDriver, consent=False)
+    subito.max_inflight = BENCH_WORKERS
+    for site in (subito, autoscout):
+        site.delay = {k: 0.0 for k in site.delay}
+    budget = {"workers": BENCH_WORKERS + autoscout.max_inflight, "requests_per_s": 0}
+
+    def run():
+        return sum(CrawlEngine.Engine([subito, autoscout], budget).run().values())
+    return _measure("engine", run)
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("command", choices=["serve", "bench"])
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--epoch", type=int, default=0, help="rounds of Subito price drops / removals to replay")
+    ap.add_argument("--site", choices=["subito", "autoscout", "engine", "all"], default="all")
+    ap.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = ap.parse_args(argv)
+
+    if args.command == "serve":
+        server = make_server(args.port, epoch=args.epoch)
+        print(f"mock marketplace on http://127.0.0.1:{args.port}/  (Ctrl-C to stop)")
+        server.serve_forever()
+        return
+
+    results = []
+    with running_server(args.port) as base, tempfile.TemporaryDirectory() as tmp:
+        if args.site in ("subito", "all"):
+            results.append(bench_subito(base, Path(tmp)))
+        if args.site in ("autoscout", "all"):
+            results.append(bench_autoscout(base, Path(tmp)))
+        if args.site in ("engine", "all"):
+            results.append(bench_engine(base, Path(tmp)))
+    for r in results:
+        if args.json:
+            print(json.dumps(r))
+        else:
+            print(f"{r['site']:<12} {r['pages']:>6} pages  {r['pages_per_s']:>7} pages/s  "
+                  f"{r['cpu_ms_per_page']:>7} ms CPU/page  peak RSS {r['peak_rss_mb']} MB  "
+                  f"rows {r['rows']}  errors {r['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Near-duplicate listing detection – MinHash/LSH with attribute blocking
+======================================================================
+Finds the same car listed more than once: Subito reposts under a new ad ID,
+dealers publishing in several regions, overlapping AutoScout ZIP radii.
+
+• **Blocking:** every listing lives in a block keyed by normalised
+  (make, model, year, km bucket, price bucket).  Lookups probe the 3×3
+  neighbouring km/price buckets, so a small price drop or odometer update
+  never hides a duplicate behind a bucket edge.
+• **MinHash/LSH:** descriptions are shingled (word 3-grams), hashed into a
+  ``NUM_PERM`` signature and split into ``BANDS`` bands; listings sharing a
+  band inside a probed block are candidates.
+• **Verification:** candidates are merged only if the estimated Jaccard
+  similarity ≥ ``JACCARD_MIN`` and mileage / price agree within tolerance.
+
+Clusters are kept in a union-find whose root is always the oldest member, so
+cluster IDs (the key of that first listing) stay stable when new batches are
+folded in.  State (signatures + record table) is saved to ``STATE_DIR`` and
+the LSH tables are rebuilt from it on load, so each run only hashes the new
+rows – O(n) overall.
+
+Output: ``OUTPUT_CSV`` with key, url, cluster_id, cluster_size – use
+cluster_id for dedup and as the group label for group-aware splits.
+"""
+
+from __future__ import annotations
+
+import csv
+import math
+import re
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from Normalize import COLLECTOR_CSVS, iter_normalized
+
+# ───────────────────── CONFIG ─────────────────────
+INPUT_FILES  = COLLECTOR_CSVS
+STATE_DIR    = Path("dedup_state")
+OUTPUT_CSV   = "listing_clusters.csv"
+NUM_PERM     = 128         # MinHash signature length
+BANDS        = 16          # LSH bands (NUM_PERM / BANDS rows each)
+SHINGLE      = 3           # words per shingle
+JACCARD_MIN  = 0.60        # estimated similarity needed to merge
+KM_BUCKET    = 10_000      # km per mileage bucket
+PRICE_STEP   = 0.10        # price buckets are 10 % wide (log scale)
+KM_TOL       = (2_000, 0.03)   # |Δkm| ≤ max(abs, rel × km)
+PRICE_TOL    = 0.10        # |Δprice| ≤ rel × price
+SEED         = 1           # fixes the hash permutations – never change with saved state
+# ─────────────────────────────────────────────────
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(SEED)
+_PERM_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+_ROWS = NUM_PERM // BANDS
+_WORD = re.compile(r"\w+")
+
+RecordRow = Tuple[str, Optional[str], Optional[str], Optional[int], Optional[float], Optional[float], Optional[str]]
+
+# ────────── MINHASH ──────────
+
+def shingles(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+    # (a·x + b) fits in 64 bits for 32-bit a, x, b, so the Mersenne modulo is exact
+    perm = ((hashes[:, None] * _PERM_A + _PERM_B) % _MERSENNE) & np.uint64(0xFFFFFFFF)
+    return perm.min(axis=0).astype(np.uint32)
+
+
+def _text_of(rec: dict) -> str:
+    """Description, or the attribute string when a listing has none."""
+    desc = (rec.get("description") or "").strip()
+    if desc:
+        return desc
+    return " ".join(str(rec.get(k) or "") for k in ("make", "model", "year", "mileage_km", "price"))
+
+# ────────── BLOCKING ──────────
+
+def km_bucket(km: Optional[float]) -> Optional[int]:
+    return None if km is None else int(km // KM_BUCKET)
+
+
+def price_bucket(price: Optional[float]) -> Optional[int]:
+    return None if not price else int(math.log(price) / math.log1p(PRICE_STEP))
+
+
+def _neighbours(b: Optional[int]) -> Iterable[Optional[int]]:
+    return (b,) if b is None else (b - 1, b, b + 1)
+
+
+def record_key(rec: dict) -> str:
+    return f"{rec.get('source')}:{rec.get('ad_id') or rec.get('url')}"
+
+# ────────── INDEX ──────────
+
+class NearDuplicateIndex:
+    """Incremental near-duplicate index; ``add_many`` returns cluster IDs."""
+
+    def __init__(self):
+        self.rows: List[RecordRow] = []     # key, make, model, year, km, price, url
+        self.sigs: List[np.ndarray] = []
+        self.parent: List[int] = []
+        self.by_key: Dict[str, int] = {}
+        self.buckets: Dict[tuple, List[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    # union-find – the smaller (older) index always becomes the root
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+    def cluster_id(self, i: int) -> str:
+        return self.rows[self.find(i)][0]
+
+    def _block(self, row: RecordRow) -> tuple:
+        _, make, model, year, km, price, _ = row
+        return make, model, year, km_bucket(km), price_bucket(price)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        return [sig[b * _ROWS:(b + 1) * _ROWS].tobytes() for b in range(BANDS)]
+
+    def _similar(self, i: int, j: int) -> bool:
+        _, _, _, _, km_i, price_i, _ = self.rows[i]
+        _, _, _, _, km_j, price_j, _ = self.rows[j]
+        if km_i is not None and km_j is not None:
+            if abs(km_i - km_j) > max(KM_TOL[0], KM_TOL[1] * max(km_i, km_j)):
+                return False
+        if price_i and price_j and abs(price_i - price_j) > PRICE_TOL * max(price_i, price_j):
+            return False
+        return float(np.mean(self.sigs[i] == self.sigs[j])) >= JACCARD_MIN
+
+    def _insert(self, row: RecordRow, sig: np.ndarray, link: bool = True) -> int:
+        i = len(self.rows)
+        self.rows.append(row)
+        self.sigs.append(sig)
+        self.parent.append(i)
+        self.by_key[row[0]] = i
+        make, model, year, kb, pb = self._block(row)
+        bands = self._band_keys(sig)
+        if link:
+            seen = set()
+            for k in _neighbours(kb):
+                for p in _neighbours(pb):
+                    for b, h in enumerate(bands):
+                        for j in self.buckets.get((make, model, year, k, p, b, h), ()):
+                            if j not in seen:
+                                seen.add(j)
+                                if self._similar(i, j):
+                                    self.union(i, j)
+        for b, h in enumerate(bands):
+            self.buckets[(make, model, year, kb, pb, b, h)].append(i)
+        return i
+
+    def add(self, rec: dict) -> str:
+        key = record_key(rec)
+        if key in self.by_key:
+            return self.cluster_id(self.by_key[key])
+        row = (key, rec.get("make"), rec.get("model"), rec.get("year"),
+               rec.get("mileage_km"), rec.get("price"), rec.get("url"))
+        return self.cluster_id(self._insert(row, minhash(_text_of(rec))))
+
+    def add_many(self, records: Iterable[dict]) -> List[str]:
+        return [self.add(rec) for rec in records]
+
+    def clusters(self) -> Dict[str, str]:
+        """key → cluster_id for every indexed listing."""
+        return {row[0]: self.cluster_id(i) for i, row in enumerate(self.rows)}
+
+    # ────────── persistence ──────────
+
+    def save(self, state_dir: Path = STATE_DIR) -> None:
+        state_dir = Path(state_dir)
+        state_dir.mkdir(parents=True, exist_ok=True)
+        sigs = np.vstack(self.sigs) if self.sigs else np.zeros((0, NUM_PERM), np.uint32)
+        np.save(state_dir / "signatures.npy", sigs)
+        with open(state_dir / "records.csv", "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["key", "make", "model", "year", "mileage_km", "price", "url", "parent"])
+            for i, row in enumerate(self.rows):
+                w.writerow([*("" if v is None else v for v in row), self.find(i)])
+
+    @classmethod
+    def load(cls, state_dir: Path = STATE_DIR) -> "NearDuplicateIndex":
+        """Rebuild the index (and its LSH tables) from a saved state; empty if none."""
+        index = cls()
+        state_dir = Path(state_dir)
+        if not (state_dir / "records.csv").is_file():
+            return index
+        sigs = np.load(state_dir / "signatures.npy")
+        with open(state_dir / "records.csv", newline="", encoding="utf-8") as f:
+            for n, r in enumerate(csv.DictReader(f)):
+                row = (r["key"], r["make"] or None, r["model"] or None,
+                       int(r["year"]) if r["year"] else None,
+                       float(r["mileage_km"]) if r["mileage_km"] else None,
+                       float(r["price"]) if r["price"] else None, r["url"] or None)
+                index._insert(row, sigs[n], link=False)
+                index.parent[n] = int(r["parent"])
+        return index
+
+
+def write_clusters(index: NearDuplicateIndex, path: str = OUTPUT_CSV) -> None:
+    roots = [index.find(i) for i in range(len(index))]
+    sizes = Counter(roots)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["key", "url", "cluster_id", "cluster_size"])
+        for row, root in zip(index.rows, roots):
+            w.writerow([row[0], row[6] or "", index.rows[root][0], sizes[root]])
+
+
+def load_clusters(path: str = OUTPUT_CSV) -> Dict[str, str]:
+    """key → cluster_id mapping written by ``write_clusters`` (for training / splits)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return {r["key"]: r["cluster_id"] for r in csv.DictReader(f)}
+
+# ────────── MAIN ──────────
+
+def main():
+    index = NearDuplicateIndex.load(STATE_DIR)
+    print(f"➜ {len(index):,} listings already indexed in {STATE_DIR}/")
+    for path in INPUT_FILES:
+        if not Path(path).is_file():
+            continue
+        before = len(index)
+        index.add_many(iter_normalized(path))
+        print(f"   {path}: +{len(index) - before:,} new listings")
+
+    index.save(STATE_DIR)
+    write_clusters(index, OUTPUT_CSV)
+    n_clusters = len({index.find(i) for i in range(len(index))})
+    print(f"🎉 {len(index):,} listings → {n_clusters:,} clusters — saved to {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Listing normalisation – Subito.it & AutoScout24
+===============================================
+Turns the raw string rows written by DataCollector.py (Subito) and
+GermanyDataCollector.py (AutoScout24) into one common record layout with
+numeric price / mileage / year / power and canonical fuel & gearbox labels.
+
+Pure standard library on purpose: it runs inside the collectors and the
+scoring service, where importing pandas would dominate start-up time.
+"""
+
+from __future__ import annotations
+
+import csv
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+# CSV rows carry full ad descriptions, which exceed the csv default limit.
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+POSTAL_CODES_CSV = Path(__file__).with_name("postal-code-germany.csv")
+
+# Every Subito region slug (DataCollector.REGIONI plus abruzzo, already crawled)
+SUBITO_REGIONS = [
+    "abruzzo", "basilicata", "calabria", "campania", "emilia-romagna",
+    "friuli-venezia-giulia", "lazio", "liguria", "lombardia", "marche",
+    "molise", "piemonte", "puglia", "sardegna", "sicilia", "toscana",
+    "trentino-alto-adige", "umbria", "valle-d-aosta", "veneto",
+]
+# Per-region collector outputs – not subito_cars_100 / _details / _jsonld, which
+# are samples of the same ads written by the older scripts
+SUBITO_REGION_CSVS = [f"subito_cars_{r}.csv" for r in SUBITO_REGIONS]
+# Every collector output read by the offline steps (NearDuplicates, MarketCube,
+# ComparablesIndex, carprice.py): the Subito regions, the two legacy AutoScout
+# dumps, GermanyDataCollector.OUTPUT_CSV and CrawlSites.AUTOSCOUT_CSV
+COLLECTOR_CSVS = SUBITO_REGION_CSVS + [
+    "GermanyData.csv", "DataGermany.csv", "AutoScout24_ZIP.csv", "AutoScout24_engine.csv",
+]
+
+NORMALIZED_FIELDS = [
+    "source", "ad_id", "url", "make", "model", "year", "mileage_km", "fuel",
+    "transmission", "power_kw", "body_type", "price", "region", "description",
+]
+
+# Makes whose name spans two words in the free-text titles
+MULTIWORD_MAKES = {
+    "alfa romeo", "aston martin", "land rover", "rolls royce", "mercedes benz",
+}
+
+FUEL_MAP = {
+    "benzina": "petrol", "benzin": "petrol", "petrol": "petrol", "gasoline": "petrol",
+    "diesel": "diesel",
+    "ibrida": "hybrid", "hybrid": "hybrid", "elettrica/benzina": "hybrid",
+    "elettrica/diesel": "hybrid", "elektro/benzin": "hybrid", "elektro/diesel": "hybrid",
+    "elettrica": "electric", "elektro": "electric", "electric": "electric",
+    "gpl": "lpg", "autogas": "lpg", "autogas (lpg)": "lpg", "lpg": "lpg",
+    "metano": "cng", "erdgas": "cng", "erdgas (cng)": "cng", "cng": "cng",
+}
+
+GEARBOX_MAP = {
+    "manuale": "manual", "schaltgetriebe": "manual", "manual": "manual",
+    "automatico": "automatic", "automatik": "automatic", "automatic": "automatic",
+    "sequenziale": "automatic", "halbautomatik": "automatic",
+}
+
+_SUBITO_AD_ID = re.compile(r"-(\d+)\.htm$")
+_AUTOSCOUT_AD_ID = re.compile(r"([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})")
+_NUMBER = re.compile(r"\d[\d.\s\xa0]*")
+_YEAR = re.compile(r"(19|20)\d\d")
+
+# ────────── FIELD PARSERS ──────────
+
+def _clean(value) -> Optional[str]:
+    """Strip whitespace; map empty strings and Subito '- (Campo)' placeholders to None."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not text or text.startswith("- (") or text.lower() in ("none", "nan", "altro"):
+        return None
+    return text
+
+
+def parse_number(value) -> Optional[float]:
+    """'7.490 €', '€ 14.999', '192000 Km', '85 kW', '195.000 circa' → float."""
+    text = _clean(value)
+    if text is None:
+        return None
+    text = text.split(",")[0]           # drop decimals / trailing ',-'
+    m = _NUMBER.search(text)
+    if not m:
+        return None
+    digits = re.sub(r"\D", "", m.group(0))
+    return float(digits) if digits else None
+
+
+def parse_year(value) -> Optional[int]:
+    """'01/2016', '2016', '2016-01' → 2016."""
+    text = _clean(value)
+    if text is None:
+        return None
+    m = _YEAR.search(text)
+    return int(m.group(0)) if m else None
+
+
+def split_make_model(title) -> tuple[Optional[str], Optional[str]]:
+    """'Alfa Romeo Stelvio 2.2 …' → ('alfa romeo', 'stelvio')."""
+    text = _clean(title)
+    if text is None:
+        return None, None
+    words = text.lower().split()
+    if len(words) >= 2 and " ".join(words[:2]) in MULTIWORD_MAKES:
+        make, rest = " ".join(words[:2]), words[2:]
+    else:
+        make, rest = words[0], words[1:]
+    if make == "mercedes benz":
+        make = "mercedes-benz"
+    return make, (rest[0] if rest else None)
+
+
+def canonical(value, mapping: Dict[str, str]) -> Optional[str]:
+    text = _clean(value)
+    if text is None:
+        return None
+    return mapping.get(text.lower(), "other")
+
+
+_federal_states: Optional[Dict[str, str]] = None
+
+
+def federal_state(zip_code) -> Optional[str]:
+    """German postal code → federal_state, from postal-code-germany.csv (loaded on first use)."""
+    global _federal_states
+    text = _clean(zip_code)
+    if text is None:
+        return None
+    if _federal_states is None:
+        _federal_states = {}
+        if POSTAL_CODES_CSV.is_file():
+            with open(POSTAL_CODES_CSV, newline="", encoding="utf-8") as f:
+                for r in csv.DictReader(f):
+                    _federal_states[r["code"].zfill(5)] = r["federal_state"]
+    return _federal_states.get(text.split(".")[0].zfill(5))
+
+
+def ad_id_from_url(url) -> Optional[str]:
+    text = _clean(url)
+    if text is None:
+        return None
+    m = _SUBITO_AD_ID.search(text) or _AUTOSCOUT_AD_ID.search(text)
+    return m.group(1) if m else None
+
+# ────────── ROW NORMALISERS ──────────
+
+def normalize_subito(row: dict, region: Optional[str] = None) -> dict:
+    """Normalise a DataCollector.py row (url, brand_model, price, year, mileage, …)."""
+    make, model = split_make_model(row.get("brand_model"))
+    return {
+        "source": "subito",
+        "ad_id": ad_id_from_url(row.get("url")),
+        "url": row.get("url"),
+        "make": make,
+        "model": model,
+        "year": parse_year(row.get("year") or row.get("first_registration_date")),
+        "mileage_km": parse_number(row.get("mileage")),
+        "fuel": canonical(row.get("fuel_type"), FUEL_MAP),
+        "transmission": canonical(row.get("transmission"), GEARBOX_MAP),
+        "power_kw": parse_number(row.get("engine_power")),
+        "body_type": (_clean(row.get("body_type")) or "").lower() or None,
+        "price": parse_number(row.get("price")),
+        "region": region,
+        "description": row.get("description"),
+    }
+
+
+def normalize_autoscout(row: dict, region: Optional[str] = None) -> dict:
+    """Normalise a GermanyDataCollector.py row (car_name, price, mileage_km, …)."""
+    make, model = split_make_model(row.get("car_name"))
+    return {
+        "source": "autoscout24",
+        "ad_id": ad_id_from_url(row.get("url")),
+        "url": row.get("url"),
+        "make": make,
+        "model": model,
+        "year": parse_year(row.get("first_registration")),
+        "mileage_km": parse_number(row.get("mileage_km")),
+        "fuel": canonical(row.get("fuel"), FUEL_MAP),
+        "transmission": canonical(row.get("transmission"), GEARBOX_MAP),
+        "power_kw": parse_number(row.get("power_kw")),
+        "body_type": None,
+        "price": parse_number(row.get("price")),
+        "region": region or federal_state(row.get("zip")),
+        "description": row.get("description"),
+    }
+
+
+def normalize_row(row: dict, region: Optional[str] = None) -> dict:
+    """Dispatch on the column layout: AutoScout rows have 'car_name', Subito rows 'brand_model'."""
+    if "car_name" in row:
+        return normalize_autoscout(row, region)
+    return normalize_subito(row, region)
+
+
+def region_from_path(path) -> Optional[str]:
+    """'subito_cars_molise.csv' → 'molise'; None unless the suffix is a SUBITO_REGIONS slug."""
+    stem = Path(path).stem
+    if stem.startswith("subito_cars_") and stem[len("subito_cars_"):] in SUBITO_REGIONS:
+        return stem[len("subito_cars_"):]
+    return None
+
+
+def iter_normalized(path) -> Iterator[dict]:
+    """Yield normalised records from one collector CSV."""
+    region = region_from_path(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield normalize_row(row, region)
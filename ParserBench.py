@@ -0,0 +1,428 @@
+"""
+Parser micro-benchmarks – frozen page corpus + golden outputs
+=============================================================
+Measures the page parsers in isolation (no network, no threads) so parser
+changes can be proven faster – and not less correct – before they ship.
+
+Targets
+-------
+• ``subito.listing``    DataCollector.estrai_link_da_pagina on copy.html
+• ``subito.detail``     DataCollector.parse_dettaglio_pagina (title, price,
+  description + "Dati principali")
+• ``subito.main_data``  DataCollector.parse_dettaglio_auto_html alone
+• ``parsersubito.infolist`` / ``subito100.infolist``  the infoList parsers
+  (``parse_info_list_html``) on the older ``<li><span>Label:</span>`` layout
+• ``autoscout.detail``  GermanyDataCollector.parse_listing_details
+
+Each target runs under every backend it supports: BeautifulSoup with
+``html.parser`` or ``lxml``, the embedded ``__NEXT_DATA__`` JSON
+(``next_data``) and – when installed – ``selectolax``.  Per backend we report
+the median per-page parse time (best of ``--repeat``), throughput, the
+tracemalloc peak per page and how many fields match the golden outputs.
+
+Corpus
+------
+``parser_corpus/`` holds gzipped pages frozen from MockMarketplace.Pages (plus
+the real copy.html listing), pages archived from the live sites
+(``real_<kind>_<ad id>.html.gz``) and ``golden.json`` with the expected
+output of each target's production backend.  Mock pages are written from the
+same markup the parsers were built for, so only the real pages can catch a
+selector that broke on the site: ``run`` warns when a detail corpus has none.
+Archive one with ``archive`` (a URL, or an HTML file saved from the browser –
+AutoScout24 usually needs the latter); ``freeze`` keeps archived pages and
+recomputes every golden output.  Review the golden diff before committing it.
+
+Usage
+-----
+    python ParserBench.py [--target subito.detail] [--repeat 10] [--json]
+    python ParserBench.py --save before.json      # … change a parser …
+    python ParserBench.py --baseline before.json  # speed-up per backend
+    python ParserBench.py freeze                  # rebuild corpus + golden
+    python ParserBench.py archive --kind subito_detail https://www.subito.it/auto/…-604759161.htm
+    python ParserBench.py archive --kind autoscout_detail saved_page.html --url https://www.autoscout24.de/angebote/…
+
+Exit status is 1 when a target's production backend no longer matches its
+golden output.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# ───────────────────── CONFIG ─────────────────────
+HERE = Path(__file__).resolve().parent
+CORPUS_DIR = HERE / "parser_corpus"
+GOLDEN_JSON = CORPUS_DIR / "golden.json"
+SUBITO_DETAIL_PAGES = 12
+SUBITO_LEGACY_PAGES = 6
+AUTOSCOUT_PAGES = 12
+REPEAT = 5                 # timed runs per page (best one counts)
+REAL_PREFIX = "real_"      # pages archived from the live sites (kept by freeze)
+REAL_REQUIRED = ("subito_detail", "autoscout_detail")   # kinds warned about without real pages
+# ─────────────────────────────────────────────────
+
+Parser = Callable[[str, str], object]
+
+# ────────── TARGETS ──────────
+# Each loader returns (corpus kind, production backend, {backend: parser}).
+# Imports are local so a missing optional dependency only skips that target.
+
+
+def _subito_listing():
+    import DataCollector as dc
+
+    def links(backend):
+        return lambda html, url: sorted(dc.estrai_link_da_pagina(html, backend))
+
+    def sx(html, url):
+        from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        pattern = re.compile(rf"^{re.escape(dc.SUBITO_BASE)}/auto/.*\.htm$")
+        hrefs = ((a.attributes.get("href") or "").strip() for a in HTMLParser(html).css("a[href]"))
+        return sorted({h for h in hrefs if pattern.match(h)})
+
+    return "subito_listing", dc.PARSER_BACKEND, {
+        "html.parser": links("html.parser"), "lxml": links("lxml"),
+        "next_data": links("next_data"), "selectolax": sx}
+
+
+def _subito_detail():
+    import DataCollector as dc
+
+    def detail(backend):
+        return lambda html, url: dc.parse_dettaglio_pagina(html, url, backend)
+
+    def sx(html, url):
+        from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        tree = HTMLParser(html)
+
+        def text(selector, sep=""):
+            node = tree.css_first(selector)
+            return node.text(separator=sep, strip=True) if node is not None else None
+
+        record = dict.fromkeys(dc.CAMPI_DETTAGLIO)
+        canon = tree.css_first('link[rel="canonical"]')
+        record["url"] = (canon.attributes.get("href") if canon is not None else None) or url
+        record["brand_model"] = text('h1[class*="AdInfo_title__"]')
+        record["price"] = text('p[class*="AdInfo_price__"]')
+        record["description"] = text('p[class*="AdDescription_description__"]', " ")
+        for feat in tree.css('div[class*="main-data_main-features-container__"] '
+                             'div[class*="main-data_main-feature__"]'):
+            img, p = feat.css_first("img"), feat.css_first("p")
+            if img is None or p is None:
+                continue
+            icon = (img.attributes.get("src") or "").rsplit("/", 1)[-1].split(".")[0]
+            if icon in dc.FEATURE_CAMPI:
+                record[dc.FEATURE_CAMPI[icon]] = p.text(strip=True)
+        return record
+
+    return "subito_detail", dc.PARSER_BACKEND, {
+        "html.parser": detail("html.parser"), "lxml": detail("lxml"),
+        "next_data": detail("next_data"), "selectolax": sx}
+
+
+def _subito_main_data():
+    import DataCollector as dc
+    return "subito_detail", dc.PARSER_BACKEND, {
+        b: (lambda html, url, b=b: dc.parse_dettaglio_auto_html(html, b)) for b in ("html.parser", "lxml")}
+
+
+def _infolist(module_name: str):
+    def load():
+        module = __import__(module_name)
+        return "subito_legacy", "html.parser", {
+            b: (lambda html, url, b=b: module.parse_info_list_html(html, url, b))
+            for b in ("html.parser", "lxml")}
+    return load
+
+
+def _autoscout_detail():
+    import GermanyDataCollector as gc
+
+    def detail(parser):
+        return lambda html, url: dict(zip(gc.HEADER, gc.parse_listing_details(html, url, parser) or []))
+
+    return "autoscout_detail", gc.DESCRIPTION_PARSER, {
+        "lxml": detail("lxml"), "html.parser": detail("html.parser")}
+
+
+TARGETS: Dict[str, Callable] = {
+    "subito.listing": _subito_listing,
+    "subito.detail": _subito_detail,
+    "subito.main_data": _subito_main_data,
+    "parsersubito.infolist": _infolist("ParserSubito"),
+    "subito100.infolist": _infolist("Subito100"),
+    "autoscout.detail": _autoscout_detail,
+}
+
+# ────────── CORPUS ──────────
+
+
+def _read_page(name: str) -> str:
+    return gzip.decompress((CORPUS_DIR / name).read_bytes()).decode("utf-8")
+
+
+def _write_page(name: str, html: str) -> None:
+    (CORPUS_DIR / name).write_bytes(gzip.compress(html.encode("utf-8"), mtime=0))
+
+
+def _golden_for(kind: str, name: str, url: str, html: str, golden: Dict[str, dict]) -> None:
+    """Snapshot the production output of every target reading ``kind`` pages."""
+    for target, loader in TARGETS.items():
+        try:
+            page_kind, reference, backends = loader()
+        except ImportError as e:
+            print(f"   ⚠️  {target}: no golden output ({e})")
+            continue
+        if page_kind == kind:
+            golden.setdefault(target, {})[name] = backends[reference](html, url)
+
+
+def freeze() -> None:
+    """Regenerate parser_corpus/ from the fixtures and snapshot golden outputs.
+    Archived real pages are kept; their golden outputs are recomputed too."""
+    from MockMarketplace import SUBITO_LISTING_TEMPLATE, Pages, _slug
+
+    pages = Pages("https://www.subito.it")
+    corpus: Dict[str, Dict[str, str]] = {"subito_listing": {}, "subito_detail": {},
+                                         "subito_legacy": {}, "autoscout_detail": {}}
+
+    def put(kind, name, url, html):
+        _write_page(name, html)
+        corpus[kind][name] = url
+
+    CORPUS_DIR.mkdir(exist_ok=True)
+    if GOLDEN_JSON.is_file():
+        for kind, names in json.loads(GOLDEN_JSON.read_text(encoding="utf-8"))["pages"].items():
+            for name, url in names.items():
+                if name.startswith(REAL_PREFIX) and (CORPUS_DIR / name).is_file():
+                    corpus[kind][name] = url
+    for old in CORPUS_DIR.glob("*.html.gz"):
+        if not old.name.startswith(REAL_PREFIX):
+            old.unlink()
+    put("subito_listing", "subito_listing_copy.html.gz",
+        "https://www.subito.it/annunci-italia/vendita/auto/",
+        SUBITO_LISTING_TEMPLATE.read_text(encoding="utf-8"))
+    n_rows = len(pages.subito_rows)
+    for k in range(max(SUBITO_DETAIL_PAGES, SUBITO_LEGACY_PAGES)):
+        ad_id = 604_000_000 + k * (n_rows // SUBITO_DETAIL_PAGES or 1)
+        url = f"https://www.subito.it/auto/{_slug(pages.subito_rows[ad_id % n_rows]['brand_model'])}-{ad_id}.htm"
+        if k < SUBITO_DETAIL_PAGES:
+            put("subito_detail", f"subito_detail_{ad_id}.html.gz", url, pages.subito_detail(ad_id, url))
+        if k < SUBITO_LEGACY_PAGES:
+            put("subito_legacy", f"subito_legacy_{ad_id}.html.gz", url, pages.subito_detail_legacy(ad_id, url))
+    for k in range(AUTOSCOUT_PAGES):
+        ad_uuid = pages._uuid("10115", 1 + k // 4, k * 7)
+        url = f"https://www.autoscout24.de/angebote/{_slug(pages._autoscout_row(ad_uuid)['car_name'])}-{ad_uuid}"
+        put("autoscout_detail", f"autoscout_detail_{ad_uuid}.html.gz", url, pages.autoscout_detail(ad_uuid, url))
+
+    golden: Dict[str, dict] = {}
+    for kind, names in corpus.items():
+        for name, url in names.items():
+            _golden_for(kind, name, url, _read_page(name), golden)
+    _save_golden(corpus, golden)
+    size = sum(p.stat().st_size for p in CORPUS_DIR.iterdir())
+    n_real = sum(name.startswith(REAL_PREFIX) for names in corpus.values() for name in names)
+    print(f"🎉 {sum(map(len, corpus.values()))} pages ({n_real} real) + golden outputs for "
+          f"{len(golden)} targets → {CORPUS_DIR.name}/ ({size / 1024:.0f} KiB)")
+
+
+def _save_golden(corpus: dict, golden: dict) -> None:
+    GOLDEN_JSON.write_text(json.dumps({"pages": corpus, "golden": golden},
+                                      ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+
+
+def archive(sources: List[str], kind: str, url: Optional[str] = None) -> None:
+    """Add pages captured from the live site (URL or saved HTML file) to the corpus.
+
+    The golden output is whatever the production parser returns today – check
+    the printed fields against the page before committing.
+    """
+    from Normalize import ad_id_from_url
+
+    if url and len(sources) > 1:
+        raise SystemExit("--url only goes with a single page")
+    frozen = json.loads(GOLDEN_JSON.read_text(encoding="utf-8"))
+    for src in sources:
+        if re.match(r"https?://", src):
+            import requests
+            from DataCollector import REQUEST_HEADERS
+            resp = requests.get(src, headers=REQUEST_HEADERS, timeout=20)
+            resp.raise_for_status()
+            html, page_url = resp.text, url or src
+        else:
+            html = Path(src).read_text(encoding="utf-8")
+            canonical = re.search(r'<link[^>]+rel="canonical"[^>]+href="([^"]+)"', html)
+            page_url = url or (canonical.group(1) if canonical else None)
+            if not page_url:
+                raise SystemExit(f"{src}: no canonical link – pass --url")
+        ad_id = ad_id_from_url(page_url)
+        if not ad_id:
+            raise SystemExit(f"{page_url}: not a listing URL")
+        name = f"{REAL_PREFIX}{kind}_{ad_id}.html.gz"
+        _write_page(name, html)
+        frozen["pages"][kind][name] = page_url
+        before = {t: dict(v) for t, v in frozen["golden"].items()}
+        _golden_for(kind, name, page_url, html, frozen["golden"])
+        for target, outputs in frozen["golden"].items():
+            if name in outputs and outputs[name] != before.get(target, {}).get(name):
+                out = outputs[name]
+                filled = (sum(v not in (None, "") for v in out.values()) if isinstance(out, dict)
+                          else len(out))
+                print(f"   {target}: {filled}/{len(out) if isinstance(out, dict) else filled} fields")
+                print("     " + json.dumps(out, ensure_ascii=False)[:400])
+        print(f"✓ {name} ← {page_url}")
+    _save_golden(frozen["pages"], frozen["golden"])
+
+# ────────── MEASUREMENT ──────────
+
+
+def _norm(value):
+    """Whitespace-insensitive comparison value ("" and None are both missing)."""
+    if value is None:
+        return None
+    value = " ".join(str(value).split())
+    return value or None
+
+
+def score(expected, got) -> tuple:
+    """(matching, total) fields: per key for records, per element for link lists."""
+    if isinstance(expected, list):
+        e, g = set(expected), set(got or ())
+        return len(e & g), len(e | g)
+    got = got or {}
+    return sum(_norm(v) == _norm(got.get(k)) for k, v in expected.items()), len(expected)
+
+
+def bench_backend(parse: Parser, pages: List[tuple], golden: dict, repeat: int) -> dict:
+    times, peaks, ok, total, bytes_in = [], [], 0, 0, 0
+    for name, url, html in pages:
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = parse(html, url)
+            best = min(best, time.perf_counter() - t0)
+        times.append(best)
+        bytes_in += len(html)
+        tracemalloc.start()
+        parse(html, url)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        if name in golden:
+            m, t = score(golden[name], out)
+            ok, total = ok + m, total + t
+    return {
+        "pages": len(pages),
+        "ms_per_page": statistics.median(times) * 1000,
+        "mb_per_s": bytes_in / sum(times) / 1e6 if sum(times) else 0.0,
+        "peak_kib": statistics.mean(peaks) / 1024,
+        "fields_ok": ok, "fields_total": total,
+    }
+
+
+def missing_real_pages(frozen: dict) -> List[str]:
+    """Page kinds whose golden check only covers MockMarketplace markup."""
+    return [kind for kind in REAL_REQUIRED
+            if not any(name.startswith(REAL_PREFIX) for name in frozen["pages"].get(kind, {}))]
+
+
+def run(targets: List[str], backends: Optional[List[str]], repeat: int) -> List[dict]:
+    frozen = json.loads(GOLDEN_JSON.read_text(encoding="utf-8"))
+    for kind in missing_real_pages(frozen):
+        print(f"⚠️  {kind}: no real pages archived – the golden check only covers mock markup "
+              f"(python ParserBench.py archive --kind {kind} …)", file=sys.stderr)
+    results = []
+    for target in targets:
+        try:
+            kind, reference, parsers = TARGETS[target]()
+        except ImportError as e:
+            results.append({"target": target, "skipped": str(e)})
+            continue
+        pages = [(name, url, _read_page(name)) for name, url in sorted(frozen["pages"][kind].items())]
+        golden = frozen["golden"].get(target, {})
+        for backend, parse in parsers.items():
+            if backends and backend not in backends:
+                continue
+            row = {"target": target, "backend": backend, "production": backend == reference}
+            try:
+                row.update(bench_backend(parse, pages, golden, repeat))
+            except ImportError as e:
+                row["skipped"] = str(e)
+            results.append(row)
+    return results
+
+
+def render(results: List[dict], baseline: Optional[Dict[tuple, dict]] = None) -> str:
+    out = [f"{'target':<22} {'backend':<12} {'ms/page':>8} {'MB/s':>7} {'peak KiB':>9} "
+           f"{'fields ok':>11}" + (f" {'vs base':>8}" if baseline else "")]
+    for r in results:
+        label = f"{r['target']:<22} {r.get('backend', '-'):<12}"
+        if "skipped" in r:
+            out.append(f"{label} skipped: {r['skipped']}")
+            continue
+        mark = "✓" if r["fields_ok"] == r["fields_total"] else "✗"
+        line = (f"{label} {r['ms_per_page']:>8.2f} {r['mb_per_s']:>7.1f} {r['peak_kib']:>9.0f} "
+                f"{r['fields_ok']:>5}/{r['fields_total']:<4}{mark}")
+        base = (baseline or {}).get((r["target"], r["backend"]))
+        if base and "ms_per_page" in base:
+            line += f" {base['ms_per_page'] / r['ms_per_page']:>7.2f}×"
+        out.append(line + ("  (production)" if r["production"] else ""))
+    return "\n".join(out)
+
+# ────────── MAIN ──────────
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("command", nargs="?", choices=["run", "freeze", "archive"], default="run")
+    ap.add_argument("sources", nargs="*", metavar="URL_OR_FILE", help="archive: pages to add")
+    ap.add_argument("--kind", choices=REAL_REQUIRED + ("subito_listing", "subito_legacy"),
+                    help="archive: corpus the pages belong to")
+    ap.add_argument("--url", help="archive: page URL when a saved file has no canonical link")
+    ap.add_argument("--target", action="append", choices=sorted(TARGETS), help="repeatable; default all")
+    ap.add_argument("--backend", action="append", help="only these backends (repeatable)")
+    ap.add_argument("--repeat", type=int, default=REPEAT)
+    ap.add_argument("--json", action="store_true", help="print results as JSON lines")
+    ap.add_argument("--save", type=Path, help="write results to this JSON file")
+    ap.add_argument("--baseline", type=Path, help="compare ms/page against a --save file")
+    args = ap.parse_args(argv)
+
+    if args.command == "freeze":
+        freeze()
+        return 0
+    if args.command == "archive":
+        if not args.sources or not args.kind:
+            ap.error("archive needs --kind and at least one URL or file")
+        archive(args.sources, args.kind, args.url)
+        return 0
+
+    results = run(args.target or list(TARGETS), args.backend, args.repeat)
+    baseline = None
+    if args.baseline:
+        baseline = {(r["target"], r.get("backend")): r
+                    for r in json.loads(args.baseline.read_text(encoding="utf-8"))}
+    if args.json:
+        for r in results:
+            print(json.dumps(r))
+    else:
+        print(render(results, baseline))
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=1), encoding="utf-8")
+
+    regressions = [r["target"] for r in results
+                   if r.get("production") and r["fields_ok"] != r["fields_total"]]
+    if regressions:
+        print(f"❌ production parser differs from golden output: {', '.join(regressions)}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,37 +3,6 @@ from bs4 import BeautifulSoup
 import re
 import time
 
-# 1) Leggi e parsifica il file copy.html salvato in precedenza
-with open("copy.html", "r", encoding="utf-8") as f:
-    html = f.read()
-
-soup = BeautifulSoup(html, "html.parser")
-
-# 2) Estrai tutti i link relativi alle pagine di dettaglio degli annunci
-#    In Subito.it gli URL delle schede auto sono del tipo:
-#    "/annunci-italia/vendita/auto/<marca>/<modello>_<id>.htm"
-#    quindi filtriamo tutti gli <a href="..."> che contengono "/vendita/auto/" ma non puntano alla listing page stessa.
-
-base_url = "https://www.subito.it"
-
-listing_links = set()
-for a in soup.find_all("a", href=True):
-    href = a["href"]
-    # Condizione: link relativo che contiene "/annunci-italia/vendita/auto/"
-    # Esclude la pagina listing principale ("/annunci-italia/vendita/auto/") e cattura solo i dettagli veri e propri
-    if href.startswith("/annunci-italia/vendita/auto/") and href != "/annunci-italia/vendita/auto/":
-        # Escludiamo eventuali link a sottosezioni (per sicurezza) controllando che finisca in ".htm"
-        if href.endswith(".htm"):
-            listing_links.add(base_url + href)
-
-print(f"Trovati {len(listing_links)} link di dettaglio:")
-for link in list(listing_links)[:10]:
-    print("  ", link)
-print()
-
-# Se il tuo copy.html contiene già molte pagine di risultati, otterrai X link in listing_links.
-# A questo punto, per ciascun link andremo a scaricare la scheda di dettaglio e a parsare i campi.
-
 # 3) Definiamo una funzione per scaricare e parsare i campi di dettaglio da ciascuna pagina
 def parse_dettaglio_auto(url):
     """
@@ -61,7 +30,16 @@ def parse_dettaglio_auto(url):
     }
     resp = requests.get(url, headers=headers, timeout=10)
     resp.raise_for_status()
-    dettaglio_soup = BeautifulSoup(resp.text, "html.parser")
+    return parse_info_list_html(resp.text, url)
+
+
+def parse_info_list_html(html, url, parser="html.parser"):
+    """
+    Parsing puro (senza rete) dell'HTML di una scheda: stesso dizionario di
+    parse_dettaglio_auto(). `parser` è il backend di BeautifulSoup
+    ("html.parser" o "lxml"); usata anche da ParserBench.py.
+    """
+    dettaglio_soup = BeautifulSoup(html, parser)
 
     # (2) In molte schede Subito, le informazioni tecniche sono elencate come <li><span class="...">Label:</span> Valore</li>
     #     Cerchiamo il contenitore generale che raggruppa la lista di specifiche.
@@ -150,21 +128,54 @@ def parse_dettaglio_auto(url):
 
     return data
 
-# 4) Cicliamo su tutti i link trovati e creiamo una lista di dizionari
-tutti_dati = []
-for idx, link in enumerate(list(listing_links)):
-    try:
-        record = parse_dettaglio_auto(link)
-        print(f"[{idx+1}/{len(listing_links)}] Parsed: {link}")
-        tutti_dati.append(record)
-        # Pausa breve per non sovraccaricare il server
-        time.sleep(0.5)
-    except Exception as e:
-        print(f"Errore nel parsing di {link}: {e}")
-
-# 5) (Facoltativo) Mostriamo i primi 5 record estratti
-print("\nEsempio dei primi 5 record:\n")
-for rec in tutti_dati[:5]:
-    for k, v in rec.items():
-        print(f"{k:25s}: {v}")
-    print("-" * 60)
\ No newline at end of file
+
+if __name__ == "__main__":
+    # 1) Leggi e parsifica il file copy.html salvato in precedenza
+    with open("copy.html", "r", encoding="utf-8") as f:
+        html = f.read()
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    # 2) Estrai tutti i link relativi alle pagine di dettaglio degli annunci
+    #    In Subito.it gli URL delle schede auto sono del tipo:
+    #    "/annunci-italia/vendita/auto/<marca>/<modello>_<id>.htm"
+    #    quindi filtriamo tutti gli <a href="..."> che contengono "/vendita/auto/" ma non puntano alla listing page stessa.
+
+    base_url = "https://www.subito.it"
+
+    listing_links = set()
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        # Condizione: link relativo che contiene "/annunci-italia/vendita/auto/"
+        # Esclude la pagina listing principale ("/annunci-italia/vendita/auto/") e cattura solo i dettagli veri e propri
+        if href.startswith("/annunci-italia/vendita/auto/") and href != "/annunci-italia/vendita/auto/":
+            # Escludiamo eventuali link a sottosezioni (per sicurezza) controllando che finisca in ".htm"
+            if href.endswith(".htm"):
+                listing_links.add(base_url + href)
+
+    print(f"Trovati {len(listing_links)} link di dettaglio:")
+    for link in list(listing_links)[:10]:
+        print("  ", link)
+    print()
+
+    # Se il tuo copy.html contiene già molte pagine di risultati, otterrai X link in listing_links.
+    # A questo punto, per ciascun link andremo a scaricare la scheda di dettaglio e a parsare i campi.
+
+    # 4) Cicliamo su tutti i link trovati e creiamo una lista di dizionari
+    tutti_dati = []
+    for idx, link in enumerate(list(listing_links)):
+        try:
+            record = parse_dettaglio_auto(link)
+            print(f"[{idx+1}/{len(listing_links)}] Parsed: {link}")
+            tutti_dati.append(record)
+            # Pausa breve per non sovraccaricare il server
+            time.sleep(0.5)
+        except Exception as e:
+            print(f"Errore nel parsing di {link}: {e}")
+
+    # 5) (Facoltativo) Mostriamo i primi 5 record estratti
+    print("\nEsempio dei primi 5 record:\n")
+    for rec in tutti_dati[:5]:
+        for k, v in rec.items():
+            print(f"{k:25s}: {v}")
+        print("-" * 60)
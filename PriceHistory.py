@@ -0,0 +1,180 @@
+"""
+Price history – append-only observation log keyed by ad ID
+==========================================================
+Every time a collector looks at a listing (new ad, listing-page snapshot,
+detail re-check) it appends one fixed-size record to ``price_history.bin``:
+
+    ad (u8) · ts (u4, unix s) · price (i4, € – -1 unknown) · event (u1) · source (u1)
+
+18 bytes per observation, never rewritten: a crash loses at most the
+unflushed tail and readers can scan the file while a crawl appends to it.
+
+``state()`` folds the log into one row per ad (first/last seen, last price
+and event, observations, recent price changes) with a lexsort + reduceat;
+``recheck_priority()`` turns that state into the re-crawl order used by
+DataCollector.py: stalest first, boosted for ads whose price moves often and
+for models with many listings.
+
+Usage
+-----
+    python PriceHistory.py                # summary of the log
+    python PriceHistory.py 604759161      # one ad's observations
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# ───────────────────── CONFIG ─────────────────────
+HISTORY_FILE = Path("price_history.bin")
+FLUSH_EVERY = 500               # buffered observations before an append
+STALE_AFTER_S = 24 * 3600       # never re-check an ad seen more recently than this
+VOLATILITY_WINDOW_S = 30 * 24 * 3600   # price changes counted towards volatility
+W_VOLATILITY = 2.0              # priority boost for an ad whose every observation changed price
+W_DEMAND = 1.0                  # priority boost for the most listed model
+# ─────────────────────────────────────────────────
+
+RECORD = np.dtype([("ad", "<u8"), ("ts", "<u4"), ("price", "<i4"), ("event", "u1"), ("source", "u1")])
+NEW, SEEN, CHANGED, GONE = range(4)
+EVENTS = ("new", "seen", "changed", "gone")
+SOURCES = ("subito", "autoscout")
+
+
+def ad_key(ad_id) -> int:
+    """Numeric ad IDs (Subito) as-is; anything else (AutoScout UUIDs) as a 64-bit hash."""
+    text = str(ad_id)
+    if text.isdigit() and int(text) < 2**64:
+        return int(text)
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+class PriceHistory:
+    """Buffered, thread-safe appender + reader of the observation log."""
+
+    def __init__(self, path: Path = HISTORY_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+
+    def __enter__(self) -> "PriceHistory":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
+
+    def record(self, source: str, ad_id, price: Optional[float], event: int,
+               ts: Optional[float] = None) -> None:
+        row = (ad_key(ad_id), int(ts if ts is not None else time.time()),
+               -1 if price is None else int(round(price)), event, SOURCES.index(source))
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        with open(self.path, "ab") as f:
+            np.array(self._pending, dtype=RECORD).tofile(f)
+        self._pending.clear()
+
+    def load(self) -> np.ndarray:
+        """Every observation so far (file + unflushed buffer)."""
+        on_disk = (np.fromfile(self.path, dtype=RECORD) if self.path.is_file()
+                   else np.zeros(0, dtype=RECORD))
+        with self._lock:
+            pending = np.array(self._pending, dtype=RECORD)
+        return np.concatenate([on_disk, pending]) if len(pending) else on_disk
+
+    def history(self, source: str, ad_id) -> List[tuple]:
+        """(datetime, price, event) observations of one ad, oldest first."""
+        obs = self.load()
+        obs = obs[(obs["ad"] == ad_key(ad_id)) & (obs["source"] == SOURCES.index(source))]
+        obs = obs[np.argsort(obs["ts"], kind="stable")]
+        return [(datetime.fromtimestamp(int(o["ts"])), None if o["price"] < 0 else int(o["price"]),
+                 EVENTS[o["event"]]) for o in obs]
+
+    def state(self, source: str, now: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """One row per ad of ``source``: ad, first_ts, last_ts, last_price,
+        last_event, n_obs and recent_changes (within VOLATILITY_WINDOW_S)."""
+        now = time.time() if now is None else now
+        obs = self.load()
+        obs = obs[obs["source"] == SOURCES.index(source)]
+        if not len(obs):
+            return {k: np.zeros(0, dtype=np.int64) for k in
+                    ("ad", "first_ts", "last_ts", "last_price", "last_event", "n_obs", "recent_changes")}
+        obs = obs[np.lexsort((obs["ts"], obs["ad"]))]
+        starts = np.flatnonzero(np.r_[True, obs["ad"][1:] != obs["ad"][:-1]])
+        ends = np.r_[starts[1:], len(obs)] - 1
+        recent = (obs["event"] == CHANGED) & (obs["ts"] >= now - VOLATILITY_WINDOW_S)
+        # the last *known* price, even if the latest observation had none (e.g. gone)
+        priced = np.where(obs["price"] >= 0, np.arange(len(obs)), -1)
+        last_priced = np.maximum.accumulate(priced)[ends]
+        last_price = np.where(last_priced >= starts, obs["price"][np.maximum(last_priced, 0)], -1)
+        return {
+            "ad": obs["ad"][starts],
+            "first_ts": obs["ts"][starts].astype(np.int64),
+            "last_ts": obs["ts"][ends].astype(np.int64),
+            "last_price": last_price.astype(np.int64),
+            "last_event": obs["event"][ends].astype(np.int64),
+            "n_obs": (ends - starts + 1).astype(np.int64),
+            "recent_changes": np.add.reduceat(recent.astype(np.int64), starts),
+        }
+
+
+def recheck_priority(state: Dict[str, np.ndarray], demand: Sequence[float],
+                     now: Optional[float] = None) -> np.ndarray:
+    """Re-crawl priority per state row (0 = do not re-check).
+
+    ``age_days × (1 + W_VOLATILITY·volatility + W_DEMAND·demand)`` where
+    volatility is the share of observations that changed the price recently
+    and ``demand`` the model's listing count scaled to [0, 1].  Ads already
+    gone or seen within STALE_AFTER_S get 0.
+    """
+    now = time.time() if now is None else now
+    demand = np.asarray(demand, dtype=np.float64)
+    age = now - state["last_ts"]
+    volatility = state["recent_changes"] / np.maximum(state["n_obs"] - 1, 1)
+    score = age / 86400 * (1 + W_VOLATILITY * volatility + W_DEMAND * demand)
+    return np.where((state["last_event"] == GONE) | (age < STALE_AFTER_S), 0.0, score)
+
+# ────────── MAIN ──────────
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("ad_id", nargs="?", help="print this ad's observations")
+    ap.add_argument("--source", choices=SOURCES, default="subito")
+    ap.add_argument("--file", type=Path, default=HISTORY_FILE)
+    args = ap.parse_args(argv)
+
+    history = PriceHistory(args.file)
+    if args.ad_id:
+        for when, price, event in history.history(args.source, args.ad_id):
+            print(f"{when:%Y-%m-%d %H:%M}  {event:<8} {'' if price is None else f'{price:,} €'}")
+        return
+    obs = history.load()
+    for source in SOURCES:
+        st = history.state(source)
+        if not len(st["ad"]):
+            continue
+        print(f"{source:<10} {len(st['ad']):>9,} ads  {int((obs['source'] == SOURCES.index(source)).sum()):>10,} obs  "
+              f"{int((st['recent_changes'] > 0).sum()):>7,} with recent price changes  "
+              f"{int((st['last_event'] == GONE).sum()):>7,} gone")
+    print(f"{args.file}: {args.file.stat().st_size / 1e6 if args.file.is_file() else 0:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
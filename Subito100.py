@@ -75,7 +75,12 @@ def parse_dettaglio_auto(url):
     }
     resp = requests.get(url, headers=headers, timeout=10)
     resp.raise_for_status()
-    dettaglio_soup = BeautifulSoup(resp.text, "html.parser")
+    return parse_info_list_html(resp.text, url)
+
+
+def parse_info_list_html(html, url, parser="html.parser"):
+    """Parsing puro dell'HTML di una scheda (infoList); `parser` = backend di BeautifulSoup."""
+    dettaglio_soup = BeautifulSoup(html, parser)
 
     # Proviamo a individuare il contenitore delle specifiche
     possibili_selettori = [
@@ -0,0 +1,313 @@
+"""
+carprice – one command line for the collectors and the offline pipeline
+=======================================================================
+Runs every job without editing source files: the CONFIG constants of the
+collectors (``REGIONI``, ``MAX_WORKERS``, ``START_FROM_IDX``, ``ZIP_LIMIT``,
+``HEADLESS``, ``OUTPUT_CSV``, …) are overridden at run time from, in order of
+increasing priority,
+
+    1. the CONFIG block of the module (unchanged defaults),
+    2. the section named after the subcommand in ``carprice.ini`` (or ``--config``),
+    3. command-line flags.
+
+Config keys are the long flag names (``start-from = 28``, ``headless = no``,
+``regions = lazio, molise``, ``metrics-port = none``); see carprice.example.ini.
+
+Only argparse / configparser are imported up front.  Each subcommand imports
+its own module when it runs, so ``normalize`` and ``count-urls`` start in a few
+milliseconds, scheduled Subito crawls never load selenium and only
+``crawl-autoscout`` pays for pandas + undetected_chromedriver.
+
+Usage
+-----
+    python carprice.py crawl-subito --regions molise lazio --workers 10
+    python carprice.py crawl-subito --exclude abruzzo
+    python carprice.py crawl-autoscout --start-from 28 --zip-limit 40 --no-headless
+    python carprice.py crawl --site subito autoscout      # CrawlEngine.py
+    python carprice.py dedup
+    python carprice.py normalize subito_cars_molise.csv -o molise_normalized.csv
+    python carprice.py train --kind gbr --model-dir price_model
+    python carprice.py score GermanyData.csv --model-dir price_model
+    python carprice.py count-urls AutoScout24_ZIP.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import configparser
+import os
+import sys
+from pathlib import Path
+
+# ───────────────────── CONFIG ─────────────────────
+CONFIG_FILE = "carprice.ini"          # read from the working directory when present
+MODEL_DIR = "price_model"
+NORMALIZED_CSV = "listings_normalized.csv"
+SCORED_CSV = "listings_scored.csv"
+SCORE_BATCH = 1000                    # records per model call in ``score``
+# ─────────────────────────────────────────────────
+
+_NONE = ("none", "off", "")
+
+
+def optional(convert):
+    """argparse type accepting 'none' / 'off' as None (e.g. ``--metrics-port none``)."""
+    def parse(text):
+        return None if text.strip().lower() in _NONE else convert(text)
+    parse.__name__ = getattr(convert, "__name__", "value")
+    return parse
+
+
+def default_inputs() -> list:
+    """Collector CSVs present here (Normalize.COLLECTOR_CSVS, as NearDuplicates / MarketCube read them)."""
+    from Normalize import COLLECTOR_CSVS
+    return [f for f in COLLECTOR_CSVS if os.path.isfile(f)]
+
+
+def configure(module, args: argparse.Namespace) -> None:
+    """Copy every UPPER_CASE option given (config or flag) onto the module's CONFIG constant."""
+    for name, value in vars(args).items():
+        if name.isupper():
+            if not hasattr(module, name):
+                raise AttributeError(f"{module.__name__} has no setting {name}")
+            setattr(module, name, value)
+
+
+def _csv_rows(paths):
+    from Normalize import iter_normalized
+    for path in paths:
+        yield from iter_normalized(path)
+
+# ────────── SUBCOMMANDS ──────────
+
+
+def cmd_crawl_subito(args) -> None:
+    import DataCollector
+
+    if getattr(args, "exclude", None):
+        regions = getattr(args, "REGIONI", DataCollector.REGIONI)
+        args.REGIONI = [r for r in regions if r not in set(args.exclude)]
+    del args.exclude
+    configure(DataCollector, args)
+    DataCollector.main()
+
+
+def cmd_crawl_autoscout(args) -> None:
+    import GermanyDataCollector
+
+    configure(GermanyDataCollector, args)
+    GermanyDataCollector.main()
+
+
+def cmd_crawl(args) -> None:
+    import CrawlEngine
+
+    argv = [f"--site={s}" for s in args.site or ()]
+    for flag in ("workers", "browsers", "rps"):
+        if getattr(args, flag, None) is not None:
+            argv.append(f"--{flag}={getattr(args, flag)}")
+    CrawlEngine.main(argv)
+
+
+def cmd_dedup(args) -> None:
+    import NearDuplicates
+
+    configure(NearDuplicates, args)
+    NearDuplicates.main()
+
+
+def cmd_normalize(args) -> None:
+    import csv
+    from Normalize import NORMALIZED_FIELDS
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    n = 0
+    try:
+        writer = csv.DictWriter(out, fieldnames=NORMALIZED_FIELDS)
+        writer.writeheader()
+        for rec in _csv_rows(args.inputs or default_inputs()):
+            writer.writerow(rec)
+            n += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"🎉 {n:,} listings normalised → {args.output}", file=sys.stderr)
+
+
+def cmd_train(args) -> None:
+    import CompiledModel
+
+    records = list(_csv_rows(args.inputs or default_inputs()))
+    print(f"➜ training {args.kind} on {len(records):,} listings …")
+    path = CompiledModel.train_and_export(records, args.model_dir, kind=args.kind)
+    print(f"🎉 compiled model saved to {path}/")
+
+
+def cmd_score(args) -> None:
+    import csv
+    from itertools import islice
+
+    import CompiledModel
+    from InlineScoring import SCORED_FIELDS, UNDERPRICED_RATIO
+
+    ratio = getattr(args, "ratio", UNDERPRICED_RATIO)
+    model = CompiledModel.load(args.model_dir)
+    rows = _csv_rows(args.inputs or default_inputs())
+    scored = flagged = 0
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SCORED_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        while batch := list(islice(rows, SCORE_BATCH)):
+            for rec in CompiledModel.score_records(model, batch):
+                rec["underpriced"] = int(rec["price"] is not None
+                                         and rec["price"] < ratio * rec["predicted_price"])
+                flagged += rec["underpriced"]
+                writer.writerow(rec)
+            scored += len(batch)
+    print(f"🎉 {scored:,} listings scored, {flagged:,} underpriced → {args.output}")
+
+
+def cmd_count_urls(args) -> None:
+    import csv
+
+    csv.field_size_limit(2**31 - 1)   # description columns, as in Normalize.py
+    seen = set()
+    for path in args.inputs:
+        with open(path, newline="", encoding="utf-8") as f:
+            urls = {row["url"] for row in csv.DictReader(f) if row.get("url")}
+        print(f"{path}: {len(urls):,} unique URLs")
+        seen |= urls
+    if len(args.inputs) > 1:
+        print(f"total: {len(seen):,} unique URLs")
+
+# ────────── PARSER ──────────
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="carprice", description=__doc__.split("\n")[1])
+    ap.add_argument("--config", default=CONFIG_FILE, help=f"INI file (default ./{CONFIG_FILE} if present)")
+    sub = ap.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    def command(name, func, help):
+        # SUPPRESS: options neither in the config nor on the command line keep the module default
+        p = sub.add_parser(name, help=help, description=help, argument_default=argparse.SUPPRESS)
+        p.set_defaults(func=func)
+        return p
+
+    p = command("crawl-subito", cmd_crawl_subito, "Subito.it collector (DataCollector.py)")
+    p.add_argument("--regions", dest="REGIONI", nargs="+", metavar="REGION", help="default: all in REGIONI")
+    p.add_argument("--exclude", nargs="+", metavar="REGION", default=[], help="regions already collected")
+    p.add_argument("--workers", dest="MAX_WORKERS", type=int, help="detail-page threads")
+    p.add_argument("--max-pages", dest="MAX_PAGES", type=int)
+    p.add_argument("--max-links", dest="MAX_LINKS", type=int)
+    p.add_argument("--delay", dest="LISTING_DELAY", type=float, help="seconds between listing pages")
+    p.add_argument("--parser", dest="PARSER_BACKEND", choices=("html.parser", "lxml", "next_data"))
+    p.add_argument("--base-url", dest="SUBITO_BASE", help="e.g. a MockMarketplace.py server")
+    p.add_argument("--price-history", dest="PRICE_HISTORY", type=optional(str), metavar="FILE",
+                   help="record prices and re-check known ads (off by default)")
+    p.add_argument("--recheck-budget", dest="RECHECK_BUDGET", type=int)
+    p.add_argument("--score-model", dest="SCORE_MODEL_DIR", type=optional(str))
+    p.add_argument("--metrics-port", dest="METRICS_PORT", type=optional(int))
+
+    p = command("crawl-autoscout", cmd_crawl_autoscout, "AutoScout24 collector (GermanyDataCollector.py)")
+    p.add_argument("--start-from", dest="START_FROM_IDX", type=int, help="1-based ZIP index to resume from")
+    p.add_argument("--zip-limit", dest="ZIP_LIMIT", type=optional(int))
+    p.add_argument("--headless", dest="HEADLESS", action=argparse.BooleanOptionalAction)
+    p.add_argument("--output", "-o", dest="OUTPUT_CSV")
+    p.add_argument("--zip-csv", dest="CSV_ZIPCODES", type=Path)
+    p.add_argument("--min-distance", dest="MIN_DISTANCE_KM", type=float)
+    p.add_argument("--max-pages", dest="MAX_PAGES", type=int)
+    p.add_argument("--score-model", dest="SCORE_MODEL_DIR", type=optional(str))
+    p.add_argument("--scored-csv", dest="SCORED_CSV")
+    p.add_argument("--metrics-port", dest="METRICS_PORT", type=optional(int))
+
+    p = command("crawl", cmd_crawl, "all sites concurrently (CrawlEngine.py)")
+    p.add_argument("--site", nargs="+", choices=("autoscout", "subito"), default=[], help="default: all")
+    p.add_argument("--workers", type=int)
+    p.add_argument("--browsers", type=int)
+    p.add_argument("--rps", type=float, help="global requests/s")
+
+    p = command("dedup", cmd_dedup, "near-duplicate clusters (NearDuplicates.py)")
+    p.add_argument("INPUT_FILES", nargs="*", metavar="CSV", help="default: collector CSVs")
+    p.add_argument("--state-dir", dest="STATE_DIR", type=Path)
+    p.add_argument("--output", "-o", dest="OUTPUT_CSV")
+    p.add_argument("--jaccard", dest="JACCARD_MIN", type=float)
+
+    p = command("normalize", cmd_normalize, "collector CSVs → one normalised CSV (Normalize.py)")
+    p.add_argument("inputs", nargs="*", metavar="CSV", default=[], help="default: collector CSVs")
+    p.add_argument("--output", "-o", default=NORMALIZED_CSV, help="'-' for stdout")
+
+    p = command("train", cmd_train, "train and compile the price model (CompiledModel.py)")
+    p.add_argument("inputs", nargs="*", metavar="CSV", default=[], help="default: collector CSVs")
+    p.add_argument("--model-dir", default=MODEL_DIR)
+    p.add_argument("--kind", choices=("gbr", "rf", "ridge"), default="gbr")
+
+    p = command("score", cmd_score, "predicted price + underpriced flag per listing")
+    p.add_argument("inputs", nargs="*", metavar="CSV", default=[], help="default: collector CSVs")
+    p.add_argument("--model-dir", default=MODEL_DIR)
+    p.add_argument("--output", "-o", default=SCORED_CSV)
+    p.add_argument("--ratio", type=float, help="underpriced below ratio × predicted (InlineScoring default)")
+
+    p = command("count-urls", cmd_count_urls, "unique listing URLs per CSV")
+    p.add_argument("inputs", nargs="+", metavar="CSV")
+    return ap
+
+
+def _config_value(action: argparse.Action, raw: str):
+    """Convert one INI value the way argparse would convert the matching flag."""
+    if isinstance(action, argparse.BooleanOptionalAction):
+        value = raw.strip().lower()
+        if value not in configparser.ConfigParser.BOOLEAN_STATES:
+            raise ValueError(f"not a boolean: {raw!r}")
+        return configparser.ConfigParser.BOOLEAN_STATES[value]
+    convert = action.type or str
+    if action.nargs in ("*", "+"):
+        return [convert(v) for v in raw.replace(",", " ").split()]
+    return convert(raw)
+
+
+def apply_config(ap: argparse.ArgumentParser, path: str) -> None:
+    """Turn the ``[<subcommand>]`` sections of an INI file into subparser defaults."""
+    cfg = configparser.ConfigParser(inline_comment_prefixes=("#", ";"))
+    if not cfg.read(path, encoding="utf-8"):
+        if path != CONFIG_FILE:
+            ap.error(f"config file {path} not found")
+        return
+    subparsers = next(a for a in ap._actions if isinstance(a, argparse._SubParsersAction))
+    for name in cfg.sections():
+        if name not in subparsers.choices:
+            ap.error(f"{path}: unknown section [{name}]")
+        p = subparsers.choices[name]
+        by_key = {}
+        for action in p._actions:
+            # flags by long name; the positional CSV list of each command is "inputs"
+            for key in [o.lstrip("-") for o in action.option_strings] or ["inputs"]:
+                by_key[key] = action
+        defaults = {}
+        for key, raw in cfg.items(name):
+            action = by_key.get(key.replace("_", "-"))
+            if action is None or action.dest in ("help", "func"):
+                ap.error(f"{path}: [{name}] has no option {key!r}")
+            try:
+                defaults[action.dest] = _config_value(action, raw)
+            except (TypeError, ValueError) as e:
+                ap.error(f"{path}: [{name}] {key}: {e}")
+        p.set_defaults(**defaults)
+
+# ────────── MAIN ──────────
+
+
+def main(argv=None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--config", default=CONFIG_FILE)
+    ap = build_parser()
+    apply_config(ap, pre.parse_known_args(argv)[0].config)
+    args = ap.parse_args(argv)
+    func = args.func
+    del args.func, args.command, args.config
+    func(args)
+
+
+if __name__ == "__main__":
+    main()